@@ -1,14 +1,27 @@
+import array
+import codecs
+import copy
 import datetime
 import decimal
 import time
 import itertools
 import iso8601
+import operator
 import pprint
 import re
+import sys
+import threading
 import translationstring
+from UserDict import DictMixin
 
 _ = translationstring.TranslationStringFactory('colander')
 
+try:
+    _memoryview = memoryview
+except NameError: # pragma: no cover
+    class _memoryview(object):
+        """ Stands in for ``memoryview`` before Python 2.7 """
+
 required = object()
 _marker = required # bw compat
 
@@ -158,13 +171,220 @@ class Invalid(Exception):
         result of an execution of this exception's ``asdict`` method"""
         return pprint.pformat(self.asdict())
 
+class Aborted(Invalid):
+    """ Base class of the :exc:`colander.Invalid` subclasses which
+    abort a whole deserialization.  Unlike other errors, they are not
+    collected into the error of the enclosing node: they propagate
+    straight to the caller of :meth:`colander.SchemaNode.deserialize`.
+    Their ``node`` is the node which was being deserialized when the
+    problem was noticed.
+    """
+
+class DeadlineExceeded(Aborted):
+    """ The :exc:`colander.Aborted` subclass raised when a
+    deserialization started with a ``deadline`` or ``budget`` (see
+    :meth:`colander.SchemaNode.deserialize`) takes too long.
+    """
+
+class LimitExceeded(Aborted):
+    """ The :exc:`colander.Aborted` subclass raised when the input to a
+    deserialization exceeds one of the limits set on a node (e.g. the
+    ``max_items`` of a :class:`colander.Sequence`) or by the
+    :class:`colander.Limits` passed to
+    :meth:`colander.SchemaNode.deserialize`.
+    """
+
+class Limits(object):
+    """ Limits on the size of the input to a deserialization, passed as
+    the ``limits`` argument of :meth:`colander.SchemaNode.deserialize`.
+    Input which exceeds one of them results in a
+    :exc:`colander.LimitExceeded` error.  Each limit is optional;
+    ``None`` (the default) means no limit.
+
+    ``max_nodes``
+        The maximum number of subnodes and items that mappings,
+        sequences and tuples deserialize, in total.
+
+    ``max_depth``
+        The maximum nesting depth of mappings, sequences and tuples.
+
+    ``max_items``, ``max_keys`` and ``max_length``
+        Defaults for the limits of the same names of the
+        :class:`colander.Sequence`, :class:`colander.Mapping` and
+        :class:`colander.String` types respectively, used for nodes
+        whose type does not set its own.
+    """
+    def __init__(self, max_nodes=None, max_depth=None, max_items=None,
+                 max_keys=None, max_length=None):
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_keys = max_keys
+        self.max_length = max_length
+
+# the state of the deserialization running in the current thread
+_run_state = threading.local()
+
+def _deadline():
+    return getattr(_run_state, 'deadline', None)
+
+def _guarded():
+    # whether the deserialization running in the current thread has a
+    # deadline or limits which containers need to check
+    return (getattr(_run_state, 'deadline', None) is not None or
+            getattr(_run_state, 'limits', None) is not None)
+
+def _limit(own, name):
+    # the limit set by a type, or else the one of the running
+    # deserialization
+    if own is not None:
+        return own
+    limits = getattr(_run_state, 'limits', None)
+    if limits is not None:
+        return getattr(limits, name)
+
+def _check_run(node):
+    # called by guarded containers before each subnode or item
+    state = _run_state
+    deadline = getattr(state, 'deadline', None)
+    if deadline is not None and time.time() > deadline:
+        raise DeadlineExceeded(node, _('Deadline exceeded'))
+    limits = getattr(state, 'limits', None)
+    if limits is not None and limits.max_nodes is not None:
+        state.nodes += 1
+        if state.nodes > limits.max_nodes:
+            raise LimitExceeded(node,
+                                _('Too many nodes (maximum ${max})',
+                                  mapping={'max':limits.max_nodes}))
+
+def _enter(node):
+    # called by guarded containers before their first subnode or item;
+    # an exception escaping a container ends the whole deserialization,
+    # which resets the depth, so only a normal exit calls _leave
+    limits = getattr(_run_state, 'limits', None)
+    if limits is not None and limits.max_depth is not None:
+        _run_state.depth += 1
+        if _run_state.depth > limits.max_depth:
+            raise LimitExceeded(node,
+                                _('Too deeply nested (maximum depth ${max})',
+                                  mapping={'max':limits.max_depth}))
+
+def _leave():
+    limits = getattr(_run_state, 'limits', None)
+    if limits is not None and limits.max_depth is not None:
+        _run_state.depth -= 1
+
+class _LRUCache(object):
+    """ A thread-safe mapping holding at most ``maxsize`` items, which
+    discards the least recently used item to make room for a new one.
+    Hits and misses of ``get`` are counted.  A deep copy of the cache
+    is the cache itself. """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # key -> link of a circular doubly linked list, in order of use:
+        # a link is [previous link, next link, key, value]
+        self.links = {}
+        self.root = root = []
+        root[:] = [root, root, None, None]
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self):
+        return len(self.links)
+
+    def get(self, key, default=None):
+        self.lock.acquire()
+        try:
+            link = self.links.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            # move the link to the most recently used end
+            link_prev, link_next = link[0], link[1]
+            link_prev[1] = link_next
+            link_next[0] = link_prev
+            root = self.root
+            last = root[0]
+            last[1] = root[0] = link
+            link[0] = last
+            link[1] = root
+            return link[3]
+        finally:
+            self.lock.release()
+
+    def put(self, key, value):
+        self.lock.acquire()
+        try:
+            links = self.links
+            link = links.get(key)
+            if link is not None:
+                link[3] = value
+                return
+            root = self.root
+            if len(links) >= self.maxsize:
+                oldest = root[1]
+                if oldest is root:
+                    return # maxsize is 0
+                root[1] = oldest[1]
+                oldest[1][0] = root
+                del links[oldest[2]]
+            last = root[0]
+            link = [last, root, key, value]
+            last[1] = root[0] = links[key] = link
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.links.clear()
+            root = self.root
+            root[:] = [root, root, None, None]
+            self.hits = self.misses = 0
+        finally:
+            self.lock.release()
+
 class All(object):
     """ Composite validator which succeeds if none of its
-    subvalidators raises an :class:`colander.Invalid` exception"""
-    def __init__(self, *validators):
+    subvalidators raises an :class:`colander.Invalid` exception.
+
+    By default, every subvalidator is called and the ``msg`` of the
+    error raised is a list of the messages of all the subvalidators
+    which failed.  If the ``short_circuit`` keyword argument is true,
+    the subvalidators are instead called in order of their ``cost``
+    attribute (those without one count as costing ``0``; ties keep
+    their order), and validation stops at the first failure, whose
+    message is the only one in the list.  This avoids running an
+    expensive validator on a value a cheap one already rejected.
+
+    The ``cost`` of an ``All`` validator is the sum of the costs of its
+    subvalidators."""
+    def __init__(self, *validators, **kw):
+        short_circuit = kw.pop('short_circuit', False)
+        if kw:
+            raise TypeError('Unexpected keyword arguments: %s' %
+                            ', '.join(sorted(kw)))
         self.validators = validators
+        self.short_circuit = short_circuit
+        costs = [getattr(validator, 'cost', 0) for validator in validators]
+        self.cost = sum(costs)
+        ordered = sorted(zip(costs, range(len(validators)), validators))
+        self.ordered = [validator for cost, index, validator in ordered]
 
     def __call__(self, node, value):
+        if self.short_circuit:
+            for validator in self.ordered:
+                try:
+                    validator(node, value)
+                except Invalid, e:
+                    raise Invalid(node, [e.msg])
+            return
+
         msgs = []
         for validator in self.validators:
             try:
@@ -175,6 +395,8 @@ class All(object):
         if msgs:
             raise Invalid(node, msgs)
 
+_missing = object()
+
 class Function(object):
     """ Validator which accepts a function and an optional message;
     the function is called with the ``value`` during validation.
@@ -200,18 +422,79 @@ class Function(object):
 
     The default value for the ``message`` when not provided via the
     constructor is ``Invalid value``.
+
+    ``cost`` is a hint of how expensive the function is to call,
+    relative to other validators; see :class:`colander.All`.  It
+    defaults to ``0``.
+
+    If ``cache`` is a positive integer, the results of the function are
+    remembered for up to that many distinct values, discarding the
+    least recently used result when the cache is full, and the
+    function is not called again for a value whose result is
+    remembered.  Values of different types are never confused, even if
+    they are equal.  Unhashable values bypass the cache.  The cache is
+    shared by copies of the validator (for instance in clones of a
+    schema) and may be used from several threads.  ``cache`` defaults
+    to ``None`` (no caching).
     """
-    def __init__(self, function, message=_('Invalid value')):
+    def __init__(self, function, message=_('Invalid value'), cost=0,
+                 cache=None):
         self.function = function
         self.message = message
+        self.cost = cost
+        if cache:
+            self.cache = _LRUCache(cache)
+        else:
+            self.cache = None
+
+    def cache_info(self):
+        """ Return a dictionary of statistics about the cache of this
+        validator, with the keys ``hits``, ``misses``, ``maxsize`` and
+        ``currsize``.  Return ``None`` if it has no cache. """
+        cache = self.cache
+        if cache is None:
+            return None
+        return {'hits':cache.hits, 'misses':cache.misses,
+                'maxsize':cache.maxsize, 'currsize':len(cache)}
+
+    def cache_clear(self):
+        """ Empty the cache of this validator and reset its
+        statistics. """
+        if self.cache is not None:
+            self.cache.clear()
 
     def __call__(self, node, value):
-        result = self.function(value)
+        cache = self.cache
+        if cache is None:
+            result = self.function(value)
+        else:
+            key = (type(value), value)
+            try:
+                result = cache.get(key, _missing)
+            except TypeError: # unhashable
+                result = self.function(value)
+            else:
+                if result is _missing:
+                    result = self.function(value)
+                    cache.put(key, result)
         if not result:
             raise Invalid(node, self.message)
         if isinstance(result, basestring):
             raise Invalid(node, result)
 
+_regex_cache = _LRUCache(1000)
+
+def _compile(regex, flags=0):
+    """ Return the compiled pattern for ``regex`` and ``flags``,
+    compiling it only if it is not in the cache """
+    # a str and a unicode pattern may be equal but compile differently
+    key = (type(regex), regex, flags)
+    pattern = _regex_cache.get(key)
+    if pattern is None:
+        pattern = re.compile(regex, flags)
+        _regex_cache.put(key, pattern)
+    return pattern
+
 class Regex(object):
     """ Regular expression validator.
 
@@ -222,15 +505,18 @@ class Regex(object):
         not match expected pattern'.
 
         The ``regex`` argument may also be a pattern object (the
-        result of ``re.compile``) instead of a string.
+        result of ``re.compile``) instead of a string.  Otherwise,
+        ``flags`` are the flags (for example, ``re.IGNORECASE``) it
+        is compiled with.  Compiled patterns are shared by all
+        validators created with the same pattern and flags.
 
         When calling, if ``value`` matches the regular expression,
         validation succeeds; otherwise, :exc:`colander.Invalid` is
         raised with the ``msg`` error message.
     """
-    def __init__(self, regex, msg=None):
+    def __init__(self, regex, msg=None, flags=0):
         if isinstance(regex, basestring):
-            self.match_object = re.compile(regex)
+            self.match_object = _compile(regex, flags)
         else:
             self.match_object = regex
         if msg is None:
@@ -242,6 +528,8 @@ class Regex(object):
         if self.match_object.match(value) is None:
             raise Invalid(node, self.msg)
 
+_email_re = re.compile(u'(?i)^[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,4}$')
+
 class Email(Regex):
     """ Email address validator. If ``msg`` is supplied, it will be
         the error message to be used when raising :exc:`colander.Invalid`;
@@ -250,8 +538,88 @@ class Email(Regex):
     def __init__(self, msg=None):
         if msg is None:
             msg = _("Invalid email address")
-        super(Email, self).__init__(
-            u'(?i)^[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,4}$', msg=msg)
+        super(Email, self).__init__(_email_re, msg=msg)
+
+# constructs whose meaning would change inside a combined pattern:
+# inline flags, named groups, numbered backreferences, conditionals
+_uncombinable_re = re.compile(r'\(\?[iLmsux(]|\(\?P|\\[1-9]')
+
+class RegexSet(object):
+    """ Validator which succeeds if the value passed to it matches each
+    of a set of named regular expressions.
+
+    ``patterns`` is a sequence of ``(name, regex)`` pairs, or a
+    dictionary mapping names to regular expressions.  Like the
+    ``regex`` argument of :class:`colander.Regex`, each regular
+    expression is matched at the start of the value, and may be a
+    string or a pattern object.
+
+    Whenever possible, the patterns are combined into a single
+    regular expression, so that the value is matched against all of
+    them in one pass.  Patterns which cannot be combined (pattern
+    objects, and strings using inline flags, named groups,
+    backreferences or conditionals) are matched one by one instead.
+
+    If ``msg`` is supplied, it is used to form the message reported
+    for each pattern which does not match; it may contain the
+    replacement target ``${name}``, representing the name of the
+    pattern.  It defaults to ``'String does not match pattern
+    ${name}'``.  When validation fails, the ``msg`` of the
+    :exc:`colander.Invalid` error raised is a list of these messages,
+    in the order of ``patterns``.
+    """
+    def __init__(self, patterns, msg=None):
+        if hasattr(patterns, 'items'):
+            patterns = sorted(patterns.items())
+        self.patterns = list(patterns)
+        if msg is None:
+            msg = _('String does not match pattern ${name}')
+        self.msg = msg
+        self.combined = None
+        self.separate = []
+        combinable = []
+        for index, (name, regex) in enumerate(self.patterns):
+            if (isinstance(regex, basestring) and
+                _uncombinable_re.search(regex) is None):
+                combinable.append((name, regex, '_p%d' % index))
+            else:
+                if isinstance(regex, basestring):
+                    regex = _compile(regex)
+                self.separate.append((name, regex))
+        if combinable:
+            # an optional lookahead per pattern: each group is set if
+            # and only if its pattern matches at the start of the value
+            combined = ''.join(['(?=(?P<%s>%s))?' % (group, regex)
+                                for name, regex, group in combinable])
+            try:
+                self.combined = _compile(combined)
+            except (re.error, AssertionError, OverflowError):
+                # e.g. too many groups for one pattern
+                for name, regex, group in combinable:
+                    self.separate.append((name, _compile(regex)))
+            else:
+                self.groups = [(name, group)
+                               for name, regex, group in combinable]
+
+    def failures(self, value):
+        """ Return a list of the names of the patterns which ``value``
+        does not match, in the order of ``patterns``."""
+        failed = set()
+        if self.combined is not None:
+            match = self.combined.match(value)
+            for name, group in self.groups:
+                if match.group(group) is None:
+                    failed.add(name)
+        for name, regex in self.separate:
+            if regex.match(value) is None:
+                failed.add(name)
+        return [name for name, regex in self.patterns if name in failed]
+
+    def __call__(self, node, value):
+        failed = self.failures(value)
+        if failed:
+            msgs = [_(self.msg, mapping={'name':name}) for name in failed]
+            raise Invalid(node, msgs)
 
 class Range(object):
     """ Validator which succeeds if the value it is passed is greater
@@ -300,6 +668,33 @@ class Range(object):
                 max_err = _(self.max_err, mapping={'val':value, 'max':self.max})
                 raise Invalid(node, max_err)
 
+    def validate_items(self, node, values):
+        """ Validate each of the ``values`` (a sequence of items of
+        ``node``) in one pass, returning a list of ``(index, exc)`` pairs
+        for the values which are out of range, where ``exc`` is the
+        :exc:`colander.Invalid` error calling this validator would
+        raise for the value at ``index``.  If ``values`` is a NumPy
+        array, the comparisons are performed by NumPy."""
+        lo, hi = self.min, self.max
+        if not len(values) or (lo is None and hi is None):
+            return []
+        if hasattr(values, 'dtype') and hasattr(values, 'nonzero'):
+            mask = None
+            if lo is not None:
+                mask = values < lo
+            if hi is not None:
+                if mask is None:
+                    mask = values > hi
+                else:
+                    mask = mask | (values > hi)
+            indexes = mask.nonzero()[0]
+        else:
+            if ((lo is None or min(values) >= lo) and
+                (hi is None or max(values) <= hi)):
+                return []
+            indexes = xrange(len(values))
+        return _item_failures(self, node, values, indexes)
+
 class Length(object):
     """ Validator which succeeds if the value passed to it has a
     length between a minimum and maximum.  The value is most often a
@@ -321,19 +716,102 @@ class Length(object):
                             mapping={'max':self.max})
                 raise Invalid(node, max_err)
 
+    def validate_items(self, node, values):
+        """ Validate each of the ``values`` (a sequence of items of
+        ``node``) in one pass, returning a list of ``(index, exc)`` pairs
+        for the values whose length is out of bounds, where ``exc`` is
+        the :exc:`colander.Invalid` error calling this validator would
+        raise for the value at ``index``."""
+        if not len(values) or (self.min is None and self.max is None):
+            return []
+        lengths = map(len, values)
+        if ((self.min is None or min(lengths) >= self.min) and
+            (self.max is None or max(lengths) <= self.max)):
+            return []
+        return _item_failures(self, node, values, xrange(len(values)))
+
 class OneOf(object):
     """ Validator which succeeds if the value passed to it is one of
-    a fixed set of values """
+    a fixed set of values.
+
+    ``choices`` is a sequence of the allowed values.  If they are all
+    hashable, membership is checked against a set built when the
+    validator is constructed, so changing ``choices`` afterwards has
+    no effect on validation.  If ``choices`` is a string, membership
+    is checked with the string itself, so that (as always) any
+    substring of it is accepted.  The error message lists the choices
+    in their original order."""
     def __init__(self, choices):
         self.choices = choices
+        if isinstance(choices, basestring):
+            self.members = choices
+            self.choices_msg = ', '.join(choices)
+            return
+        try:
+            self.members = frozenset(choices)
+        except TypeError:
+            # unhashable choices can only be scanned
+            self.members = choices
+        self.choices_msg = ', '.join(['%s' % x for x in choices])
+
+    def _contains(self, value):
+        try:
+            return value in self.members
+        except TypeError:
+            # an unhashable value is not in a set of hashable choices
+            return False
 
     def __call__(self, node, value):
-        if not value in self.choices:
-            choices = ', '.join(['%s' % x for x in self.choices])
+        if not self._contains(value):
             err = _('"${val}" is not one of ${choices}',
-                    mapping={'val':value, 'choices':choices})
+                    mapping={'val':value, 'choices':self.choices_msg})
             raise Invalid(node, err)
 
+    def validate_items(self, node, values):
+        """ Validate each of the ``values`` (a sequence of items of
+        ``node``) in one pass, returning a list of ``(index, exc)`` pairs
+        for the values which are not among the choices, where ``exc``
+        is the :exc:`colander.Invalid` error calling this validator
+        would raise for the value at ``index``."""
+        contains = self._contains
+        indexes = [index for index, value in enumerate(values)
+                   if not contains(value)]
+        return _item_failures(self, node, values, indexes)
+
+def _item_failures(validator, node, values, indexes):
+    failures = []
+    for index in indexes:
+        index = int(index)
+        try:
+            validator(node, values[index])
+        except Invalid, e:
+            failures.append((index, e))
+    return failures
+
+def _items_validator(validator):
+    # the validate_items method of the validator, unless it would not
+    # make the checks of the validator's __call__ (because a subclass
+    # overrides __call__ but not validate_items)
+    validate_items = getattr(validator, 'validate_items', None)
+    if validate_items is None:
+        return None
+    cls = type(validator)
+    for owner in cls.__mro__:
+        if 'validate_items' in owner.__dict__:
+            call = getattr(getattr(cls, '__call__', None), 'im_func', None)
+            if call is not getattr(owner.__call__, 'im_func', None):
+                return None
+            break
+    return validate_items
+
+def _plain(node):
+    # whether the class of the node keeps SchemaNode.deserialize, so that
+    # the node may be deserialized by its _deserialize method without
+    # skipping an override
+    deserialize = getattr(type(node), 'deserialize', None)
+    return (getattr(deserialize, 'im_func', None) is
+            SchemaNode.deserialize.im_func)
+
 class SchemaType(object):
     """ Base class for all schema types """
     def flatten(self, node, appstruct, prefix='', listitem=False):
@@ -386,6 +864,108 @@ class Mapping(SchemaType):
 
         Default: ``ignore``.
 
+    The constructor of this type also accepts an optional ``sparse``
+    keyword argument.  An attribute of the same name can be set on a
+    type instance to control the behavior after construction.
+
+    sparse
+        If ``sparse`` is true, serialization omits the keys whose
+        serialization is :attr:`colander.null` from the resulting
+        dictionary, and the :attr:`colander.null` value passed to the
+        ``serialize`` method of this class is serialized as
+        :attr:`colander.null` rather than as a dictionary.  This keeps
+        the cstructs of sparsely populated schemas small.  It has no
+        effect on deserialization.
+
+        Default: ``False``.
+
+    The constructor of this type also accepts an optional ``lazy``
+    keyword argument.  An attribute of the same name can be set on a
+    type instance to control the behavior after construction.
+
+    lazy
+        If ``lazy`` is true, deserialization returns a
+        :class:`colander.LazyMapping` instead of a dictionary.  Each
+        value of a lazy mapping is deserialized and validated the
+        first time it is accessed.  Unknown keys are still handled at
+        deserialization time.  It has no effect on serialization.
+
+        Default: ``False``.
+
+    The constructor of this type also accepts an optional ``factory``
+    keyword argument.  An attribute of the same name can be set on a
+    type instance to control the behavior after construction.
+
+    factory
+        ``factory`` controls the type of the appstruct returned by
+        deserialization.  If it is ``None``, a dictionary is returned.
+        If it is a callable (for example a class with ``__slots__`` or
+        a ``collections.namedtuple`` class), it is called with the
+        deserialized values as keyword arguments named after the
+        subnodes, and its return value is returned.  If it is the
+        string ``record``, a subclass of :class:`colander.Record` with a
+        slot per subnode is generated (once per set of subnode names)
+        and used as the factory; the names of the subnodes must then be
+        valid Python identifiers which are not attributes of
+        :class:`colander.Record`, or deserialization raises a
+        :exc:`ValueError`.  ``factory`` is ignored when ``lazy``
+        is true.  Unknown keys cannot be preserved in the result of a
+        factory, so a ``factory`` may not be combined with an
+        ``unknown`` value of ``preserve``.
+
+        Default: ``None``.
+
+    The constructor of this type also accepts an optional
+    ``attributes`` keyword argument.  An attribute of the same name can
+    be set on a type instance to control the behavior after
+    construction.
+
+    attributes
+        If ``attributes`` is true, an appstruct passed to the
+        ``serialize`` method which is not a mapping (it lacks a ``keys``
+        or a ``__getitem__`` method) is not converted to a dictionary;
+        instead, the value for each subnode is read from the attribute
+        of the appstruct named after the subnode (e.g. from an ORM
+        object), using getters compiled once per schema node.  A
+        missing attribute is treated like a missing key, and
+        ``unknown`` is not consulted.  It has no effect on
+        deserialization.
+
+        Default: ``False``.
+
+    The constructor of this type also accepts an optional ``executor``
+    keyword argument.  An attribute of the same name can be set on a
+    type instance to control the behavior after construction.
+
+    executor
+        If ``executor`` is not ``None``, it must be an object with a
+        ``submit`` method like that of a
+        ``concurrent.futures.ThreadPoolExecutor``.  During
+        deserialization, the validators of subnodes which have a
+        positive ``cost`` attribute (see :class:`colander.All`) are
+        submitted to the executor rather than called directly, so that
+        the expensive validators of sibling subnodes run concurrently.
+        Deserialization waits for all of them before returning; their
+        errors are reported exactly as if they had been called
+        directly, in subnode order.  It has no effect on serialization
+        or when ``lazy`` is true.
+
+        Default: ``None``.
+
+    The constructor of this type also accepts an optional ``max_keys``
+    keyword argument.  An attribute of the same name can be set on a
+    type instance to control the behavior after construction.
+
+    max_keys
+        If ``max_keys`` is not ``None``, deserializing a cstruct with
+        more keys raises a :exc:`colander.LimitExceeded` error before
+        any of its values are deserialized.  If it is ``None``, the
+        ``max_keys`` of the :class:`colander.Limits` of the
+        deserialization, if any, applies.  It has no effect on
+        serialization.
+
+        Default: ``None``.
+
     Special behavior is exhibited when a subvalue of a mapping is
     present in the schema but is missing from the mapping passed to
     either the ``serialize`` or ``deserialize`` method of this class.
@@ -400,10 +980,23 @@ class Mapping(SchemaType):
     If the :attr:`colander.null` value is passed to the serialize
     method of this class, a dictionary will be returned, where each of
     the values in the returned dictionary is the serialized
-    representation of the null value for its type.
+    representation of the null value for its type (unless ``sparse``
+    is true).
     """
-    def __init__(self, unknown='ignore'):
+    def __init__(self, unknown='ignore', sparse=False, lazy=False,
+                 factory=None, attributes=False, executor=None,
+                 max_keys=None):
         self.unknown = unknown
+        self.sparse = sparse
+        self.lazy = lazy
+        self.factory = factory
+        self.attributes = attributes
+        self.executor = executor
+        self.max_keys = max_keys
+        if factory is not None and unknown == 'preserve':
+            raise ValueError(
+                'a factory cannot be used when the unknown attribute is '
+                '"preserve"')
 
     def _set_unknown(self, value):
         if not value in ('ignore', 'raise', 'preserve'):
@@ -426,55 +1019,213 @@ class Mapping(SchemaType):
                           mapping = {'val':value, 'err':e})
                           )
 
-    def _impl(self, node, value, callback):
+    def _getters(self, node):
+        return self._cached(node, 'getters', _node_getters)
+
+    def _source(self, node, value):
+        # the mapping to take subvalues from and the function which takes
+        # one out of it
+        if self.unknown == 'ignore' and isinstance(value, dict):
+            # leftover keys are not consulted, so there is no need to
+            # copy the (potentially large) mapping in order to pop them
+            return value, value.get
         value = self._validate(node, value)
+        return value, value.pop
+
+    def _leftover(self, node, value, result):
+        # handle the keys left in the mapping after the subvalues have
+        # been popped out of it
+        if self.unknown == 'raise':
+            if value:
+                raise Invalid(
+                    node,
+                    _('Unrecognized keys in mapping: "${val}"',
+                      mapping={'val':value})
+                    )
+
+        elif self.unknown == 'preserve':
+            result.update(value)
+
+    def _check_keys(self, node, value):
+        max_keys = _limit(self.max_keys, 'max_keys')
+        if max_keys is not None:
+            if not hasattr(value, '__len__'):
+                value = self._validate(node, value)
+            if len(value) > max_keys:
+                raise LimitExceeded(node,
+                                    _('Too many keys (maximum ${max})',
+                                      mapping={'max':max_keys}))
+        return value
+
+    def _cached(self, node, key, build):
+        # the value build(node) derived from the subnodes of the node,
+        # cached in the node for as long as its children list holds the
+        # same subnodes (it may be changed directly)
+        cache = getattr(node, '_cache', None)
+        if cache is not None:
+            entry = cache.get(key)
+            if entry is not None and entry[0] == node.children:
+                return entry[1]
+        value = build(node)
+        if cache is not None:
+            cache[key] = (list(node.children), value)
+        return value
+
+    def _record_type(self, node):
+        return self._cached(node, 'record', _node_record_type)
+
+    def _construct(self, node, result):
+        factory = self.factory
+        if factory is not None:
+            if factory == 'record':
+                factory = self._record_type(node)
+            result = factory(**result)
+        return result
+
+    def _impl(self, node, value, callback, sparse=False, getters=None,
+              pending=None):
+        if getters is not None:
+            getter = None
+        else:
+            value, getter = self._source(node, value)
 
         error = None
         result = {}
+        guarded = _guarded()
+        if guarded:
+            _enter(node)
 
         for num, subnode in enumerate(node.children):
+            if guarded:
+                _check_run(node)
             name = subnode.name
-            subval = value.pop(name, null)
+            if getter is not None:
+                subval = getter(name, null)
+            else:
+                try:
+                    subval = getters[num](value)
+                except AttributeError:
+                    subval = null
             try:
-                result[name] = callback(subnode, subval)
+                subresult = callback(subnode, subval)
+            except Aborted:
+                raise
             except Invalid, e:
                 if error is None:
                     error = Invalid(node)
                 error.add(e, num)
+                continue
+            if not (sparse and subresult is null):
+                result[name] = subresult
+
+        if pending:
+            # wait for the validators the callback submitted, by name
+            for num, subnode in enumerate(node.children):
+                future = pending.get(subnode.name)
+                if future is None:
+                    continue
+                try:
+                    future.result()
+                except Invalid, e:
+                    if error is None:
+                        error = Invalid(node)
+                    error.add(e, num)
+            if error is not None:
+                error.children.sort(key=operator.attrgetter('pos'))
 
-        if self.unknown == 'raise':
-            if value:
-                raise Invalid(
-                    node,
-                    _('Unrecognized keys in mapping: "${val}"',
-                      mapping={'val':value})
-                    )
+        if guarded:
+            _leave()
 
-        elif self.unknown == 'preserve':
-            result.update(value)
+        if getters is None:
+            # (attributes of an object are never unknown keys)
+            self._leftover(node, value, result)
 
         if error is not None:
             raise error
 
         return result
 
-    def serialize(self, node, appstruct):
+    def serialize(self, node, appstruct, sparse=None):
+        """
+        Along with the normal ``node`` and ``appstruct`` arguments,
+        this method accepts an additional optional keyword argument:
+        ``sparse``.  This keyword argument can be used to override the
+        constructor value of the same name.
+
+        The default of ``sparse`` is ``None``, which means respect the
+        default ``sparse`` value attached to this instance via its
+        constructor.
+        """
+        if sparse is None:
+            sparse = self.sparse
+
         if appstruct is null:
+            if sparse:
+                return null
             appstruct = {}
 
         def callback(subnode, subappstruct):
             return subnode.serialize(subappstruct)
 
-        return self._impl(node, appstruct, callback)
+        getters = None
+        if (self.attributes and not isinstance(appstruct, dict) and
+            not (hasattr(appstruct, 'keys') and
+                 hasattr(appstruct, '__getitem__'))):
+            # an object which is not a mapping
+            getters = self._getters(node)
+
+        return self._impl(node, appstruct, callback, sparse, getters)
 
     def deserialize(self, node, cstruct):
         if cstruct is null:
             return null
 
-        def callback(subnode, subcstruct):
-            return subnode.deserialize(subcstruct)
+        cstruct = self._check_keys(node, cstruct)
 
-        return self._impl(node, cstruct, callback)
+        if self.lazy:
+            return self._lazy(node, cstruct)
+
+        executor = self.executor
+        if executor is None:
+            def callback(subnode, subcstruct):
+                return subnode.deserialize(subcstruct)
+            pending = None
+        else:
+            pending = {}
+            def callback(subnode, subcstruct):
+                if not _plain(subnode):
+                    return subnode.deserialize(subcstruct)
+                appstruct, validate = subnode._deserialize(subcstruct)
+                validator = subnode.validator
+                if (validate and validator is not None and
+                    not isinstance(validator, deferred)):
+                    if getattr(validator, 'cost', 0) > 0:
+                        pending[subnode.name] = executor.submit(
+                            validator, subnode, appstruct)
+                    else:
+                        validator(subnode, appstruct)
+                return appstruct
+
+        result = self._impl(node, cstruct, callback, pending=pending)
+        return self._construct(node, result)
+
+    def _lazy(self, node, value):
+        value = self._validate(node, value)
+        unknown = self.unknown
+        extra = {}
+
+        if unknown != 'ignore':
+            extra = value.copy()
+            for subnode in node.children:
+                extra.pop(subnode.name, None)
+            if extra and unknown == 'raise':
+                raise Invalid(
+                    node,
+                    _('Unrecognized keys in mapping: "${val}"',
+                      mapping={'val':extra})
+                    )
+
+        return LazyMapping(node, value, extra)
 
     def flatten(self, node, appstruct, prefix='', listitem=False):
         result = {}
@@ -512,6 +1263,194 @@ class Mapping(SchemaType):
         return appstruct[path]
 
 
+class LazyMapping(DictMixin):
+    """ A dictionary-like appstruct returned by the ``deserialize``
+    method of a :class:`colander.Mapping` type whose ``lazy`` attribute
+    is true.
+
+    The value of a key named by a subnode of ``node`` is deserialized
+    (and validated) from the cstruct the first time it is accessed,
+    and is remembered afterwards.  If the subnode cannot deserialize
+    its cstruct, an :exc:`colander.Invalid` exception for ``node`` is
+    raised on access; it has the same shape as the exception the
+    eager deserialization of the same mapping would raise for that
+    subnode.  Operations which need every value (comparison,
+    ``items()``, ``dict(lazymapping)``) deserialize every value.
+
+    A validator of the node which deserialized this mapping receives
+    it before any of its values are deserialized, so such a validator
+    only deserializes the values it accesses.
+    """
+    def __init__(self, node, cstruct, extra=None):
+        self.node = node
+        self._cstruct = cstruct
+        self._positions = {}
+        self._keys = []
+        for num, subnode in enumerate(node.children):
+            self._positions[subnode.name] = num
+            self._keys.append(subnode.name)
+        self._values = {}
+        if extra:
+            self._keys.extend(extra)
+            self._values.update(extra)
+
+    def _deserialize(self, name):
+        num = self._positions[name]
+        subnode = self.node.children[num]
+        try:
+            value = subnode.deserialize(self._cstruct.get(name, null))
+        except Invalid, e:
+            error = Invalid(self.node)
+            error.add(e, num)
+            raise error
+        self._values[name] = value
+        return value
+
+    def __getitem__(self, name):
+        values = self._values
+        if name in values:
+            return values[name]
+        if name not in self._positions:
+            raise KeyError(name)
+        return self._deserialize(name)
+
+    def __setitem__(self, name, value):
+        if name not in self._values and name not in self._positions:
+            self._keys.append(name)
+        self._values[name] = value
+
+    def __delitem__(self, name):
+        if name not in self._values and name not in self._positions:
+            raise KeyError(name)
+        self._keys.remove(name)
+        self._values.pop(name, None)
+        self._positions.pop(name, None)
+
+    def keys(self):
+        return list(self._keys)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name):
+        return name in self._values or name in self._positions
+
+    has_key = __contains__
+
+    def validate_all(self):
+        """ Deserialize and validate every value which has not been
+        accessed yet.  If any of them cannot be deserialized, raise an
+        :exc:`colander.Invalid` exception which reports all of their
+        errors, like the eager deserialization of the mapping would.
+        Return this mapping."""
+        error = None
+        values = self._values
+        for name in self._keys:
+            if name in values:
+                continue
+            try:
+                self._deserialize(name)
+            except Invalid, e:
+                if error is None:
+                    error = Invalid(self.node)
+                error.children.extend(e.children)
+        if error is not None:
+            raise error
+        return self
+
+    def __repr__(self):
+        return '<%s.%s object at %d (%d of %d values resolved)>' % (
+            self.__module__,
+            self.__class__.__name__,
+            id(self),
+            len(self._values),
+            len(self._keys),
+            )
+
+class Record(object):
+    """ Base class of the compact record types used as the appstruct
+    of a :class:`colander.Mapping` type whose ``factory`` is
+    ``record``.  Use :func:`colander.record_type` to create a subclass.
+
+    A record stores each value in a slot named after its key.  Values
+    can be accessed as attributes or by key (``record.name``,
+    ``record['name']``), and a record can be converted to a dictionary
+    using ``dict(record)``."""
+    __slots__ = ()
+
+    def __init__(self, **kw):
+        for name, value in kw.iteritems():
+            setattr(self, name, value)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        setattr(self, name, value)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return False
+        for name in self.__slots__:
+            if getattr(self, name, null) != getattr(other, name, null):
+                return False
+        return True
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        items = ['%s=%r' % (name, getattr(self, name, null))
+                 for name in self.__slots__]
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(items))
+
+_record_types = {}
+_identifier_re = re.compile(r'[A-Za-z_][A-Za-z0-9_]*$')
+
+def record_type(names):
+    """ Return a subclass of :class:`colander.Record` with one slot for
+    each of the ``names``.  The same class is returned for the same
+    sequence of names.  A :exc:`ValueError` is raised if a name is not
+    a valid Python identifier or is the name of an attribute of
+    :class:`colander.Record` (such as ``keys`` or ``get``)."""
+    names = tuple(names)
+    try:
+        return _record_types[names]
+    except KeyError:
+        for name in names:
+            if not _identifier_re.match(name):
+                raise ValueError(
+                    'record field name %r is not an identifier' % (name,))
+            if hasattr(Record, name):
+                raise ValueError(
+                    'record field name %r is reserved' % (name,))
+        cls = type('Record', (Record,), {'__slots__':names})
+        _record_types[names] = cls
+        return cls
+
+def _node_getters(node):
+    return [operator.attrgetter(subnode.name) for subnode in node.children]
+
+def _node_record_type(node):
+    return record_type([subnode.name for subnode in node.children])
+
 class Positional(object):
     """
     Marker abstract base class meaning 'this type has children which
@@ -558,16 +1497,26 @@ class Tuple(Positional, SchemaType):
         value = self._validate(node, value)
         error = None
         result = []
+        guarded = _guarded()
+        if guarded:
+            _enter(node)
 
         for num, subnode in enumerate(node.children):
+            if guarded:
+                _check_run(node)
             subval = value[num]
             try:
                 result.append(callback(subnode, subval))
+            except Aborted:
+                raise
             except Invalid, e:
                 if error is None:
                     error = Invalid(node)
                 error.add(e, num)
 
+        if guarded:
+            _leave()
+
         if error is not None:
             raise error
 
@@ -670,15 +1619,48 @@ class Sequence(Positional, SchemaType):
 
     The default value of ``accept_scalar`` is ``False``.
 
+    If the optional ``max_items`` argument is not ``None``,
+    deserializing a sequence of more items raises a
+    :exc:`colander.LimitExceeded` error, without consuming more than
+    one item over the limit from an iterator.  If it is ``None`` (the
+    default), the ``max_items`` of the :class:`colander.Limits` of the
+    deserialization, if any, applies.
+
     If the :attr:`colander.null` value is passed to the serialize
     method of this class, the :attr:`colander.null` value is returned.
+
+    If the validator of the subnode has a ``validate_items`` method
+    (like :class:`colander.Range`, :class:`colander.Length` and
+    :class:`colander.OneOf` do), deserialization does not call the
+    validator once per item; it deserializes every item, then passes
+    all of them to ``validate_items`` at once.  This is not done for
+    a validator whose class overrides ``__call__`` without also
+    providing its own ``validate_items`` (for instance a subclass of
+    :class:`colander.Range` with extra checks), as ``validate_items``
+    would not make those checks.
     """
-    def __init__(self, accept_scalar=False):
+    def __init__(self, accept_scalar=False, max_items=None):
         self.accept_scalar = accept_scalar
+        self.max_items = max_items
 
-    def _validate(self, node, value, accept_scalar):
+    def _validate(self, node, value, accept_scalar, max_items=None):
         if hasattr(value, '__iter__') and not hasattr(value, 'get'):
-            return list(value)
+            if max_items is None:
+                return list(value)
+            if hasattr(value, '__len__'):
+                # reject the value before copying it
+                count = len(value)
+                if count <= max_items:
+                    value = list(value)
+            else:
+                # never consume more than one item over the limit
+                value = list(itertools.islice(value, max_items + 1))
+                count = len(value)
+            if count > max_items:
+                raise LimitExceeded(node,
+                                    _('Too many items (maximum ${max})',
+                                      mapping={'max':max_items}))
+            return value
         if accept_scalar:
             return [value]
         else:
@@ -686,28 +1668,93 @@ class Sequence(Positional, SchemaType):
                                   mapping={'val':value})
                           )
 
-    def _impl(self, node, value, callback, accept_scalar):
+    def _impl(self, node, value, callback, accept_scalar,
+              validate_items=None, max_items=None):
         if accept_scalar is None:
             accept_scalar = self.accept_scalar
 
-        value = self._validate(node, value, accept_scalar)
-
-        error = None
+        value = self._validate(node, value, accept_scalar, max_items)
         result = []
+        errors = {}
 
-        for num, subval in enumerate(value):
-            try:
-                result.append(callback(node.children[0], subval))
-            except Invalid, e:
-                if error is None:
-                    error = Invalid(node)
-                error.add(e, num)
+        for done in self._chunks(node, value, callback, validate_items,
+                                 len(value) or 1, result, errors):
+            pass
+
+        return self._result(node, result, errors)
+
+    def _chunks(self, node, value, callback, validate_items, chunk_size,
+                result, errors):
+        # process the items of the list ``value`` ``chunk_size`` at a
+        # time, appending their results to ``result`` and recording their
+        # errors by index in ``errors``; yield the number of items
+        # processed after each chunk
+        total = len(value)
+        if not total:
+            return
+        subnode = node.children[0]
+        guarded = _guarded()
+        if guarded:
+            _enter(node)
+
+        for start in xrange(0, total, chunk_size):
+            stop = min(start + chunk_size, total)
+
+            if validate_items is None:
+                for num in xrange(start, stop):
+                    if guarded:
+                        _check_run(node)
+                    try:
+                        result.append(callback(subnode, value[num]))
+                    except Aborted:
+                        raise
+                    except Invalid, e:
+                        errors[num] = e
 
-        if error is not None:
+            else:
+                # deserialize every item without validating it, then
+                # validate all of the items which need it with one call
+                indexes = []
+                checked = []
+                for num in xrange(start, stop):
+                    if guarded:
+                        _check_run(node)
+                    try:
+                        appstruct, validate = subnode._deserialize(value[num])
+                    except Aborted:
+                        raise
+                    except Invalid, e:
+                        errors[num] = e
+                        continue
+                    result.append(appstruct)
+                    if validate:
+                        indexes.append(num)
+                        checked.append(appstruct)
+                if checked:
+                    for pos, e in validate_items(subnode, checked):
+                        errors[indexes[pos]] = e
+
+            yield stop
+
+        if guarded:
+            _leave()
+
+    def _result(self, node, result, errors):
+        if errors:
+            error = Invalid(node)
+            for num in sorted(errors):
+                error.add(errors[num], num)
             raise error
 
         return result
 
+    def _validate_items(self, node):
+        # the vectorized validation method of the subnode's validator,
+        # unless the subnode overrides deserialize
+        if node.children and _plain(node.children[0]):
+            validator = getattr(node.children[0], 'validator', None)
+            return _items_validator(validator)
+
     def serialize(self, node, appstruct, accept_scalar=None):
         """
         Along with the normal ``node`` and ``appstruct`` arguments,
@@ -762,7 +1809,9 @@ class Sequence(Positional, SchemaType):
         def callback(subnode, subcstruct):
             return subnode.deserialize(subcstruct)
 
-        return self._impl(node, cstruct, callback, accept_scalar)
+        return self._impl(node, cstruct, callback, accept_scalar,
+                          self._validate_items(node),
+                          _limit(self.max_items, 'max_items'))
 
     def flatten(self, node, appstruct, prefix='', listitem=False):
         result = {}
@@ -821,7 +1870,7 @@ Seq = Sequence
 class String(SchemaType):
     """ A type representing a Unicode string.
 
-    This type constructor accepts one argument:
+    This type constructor accepts these arguments:
 
     ``encoding``
        Represents the encoding which should be applied to value
@@ -874,28 +1923,106 @@ class String(SchemaType):
        encoding.  If this is not true, an :exc:`colander.Invalid`
        error will result.
 
+       The codec for ``encoding`` is looked up once, when the type is
+       constructed.  A string provided to ``serialize`` is only
+       decoded to check that it is valid; the original string is
+       returned rather than a re-encoded copy.
+
+    ``intern``
+       If true, deserialization returns a canonical instance for each
+       distinct value, so that equal strings deserialized by this type
+       share a single object.  This saves memory when a field takes
+       few distinct values over many records.  The table of canonical
+       instances holds at most ``intern_size`` (by default, 1000)
+       values; values beyond that are returned as they are.  Strings
+       deserialized for a node whose validator is a
+       :class:`colander.OneOf` are always interned if they are one of
+       its choices, and never interned otherwise, so that rejected
+       input does not fill the table.  ``intern`` defaults to
+       ``False``.
+
+    ``max_length``
+       If not ``None``, deserializing a string longer than this many
+       characters raises a :exc:`colander.LimitExceeded` error.  If it
+       is ``None`` (the default), the ``max_length`` of the
+       :class:`colander.Limits` of the deserialization, if any,
+       applies.
+
+    ``buffer`` and ``memoryview`` objects are accepted wherever a
+    string is, and are decoded without first being copied into a
+    string.  If ``encoding`` is ``None``, they are decoded using the
+    default encoding.
+
     The subnodes of the :class:`colander.SchemaNode` that wraps
     this type are ignored.
     """
-    def __init__(self, encoding=None):
+    intern_size = 1000
+    encoding = None
+    intern = False
+    max_length = None
+    # the codec functions and the interning table, created on demand by
+    # instances of subclasses which do not call String.__init__
+    encoder = decoder = None
+    interned = None
+
+    def __init__(self, encoding=None, intern=False, max_length=None):
         self.encoding = encoding
+        self.intern = intern
+        self.max_length = max_length
+        self._lookup()
+        self.interned = {}
+
+    def _lookup(self):
+        codec = codecs.lookup(self.encoding or sys.getdefaultencoding())
+        self.encoder, self.decoder = codec[:2]
+
+    def _intern(self, value):
+        interned = self.interned
+        if interned is None:
+            interned = self.interned = {}
+        result = interned.get(value)
+        if result is None:
+            result = value
+            if len(interned) < self.intern_size:
+                interned[value] = value
+        return result
+
+    def _decode(self, data):
+        if self.decoder is None:
+            self._lookup()
+        result, consumed = self.decoder(data)
+        if consumed != len(data):
+            # some decoders stop quietly at a truncated last character
+            raise UnicodeError('truncated data')
+        return result
 
     def serialize(self, node, appstruct):
         if appstruct is null:
             return null
 
         try:
+            encoding = self.encoding
             if isinstance(appstruct, unicode):
-                if self.encoding:
-                    result = appstruct.encode(self.encoding)
+                if encoding:
+                    if self.encoder is None:
+                        self._lookup()
+                    result = self.encoder(appstruct)[0]
                 else:
                     result = appstruct
-            else:
-                encoding = self.encoding
-                if encoding:
-                    result = unicode(appstruct, encoding).encode(encoding)
+            elif encoding:
+                if isinstance(appstruct, str):
+                    self._decode(appstruct)
+                    result = appstruct
+                elif isinstance(appstruct, buffer):
+                    self._decode(appstruct)
+                    result = str(appstruct)
+                elif isinstance(appstruct, _memoryview):
+                    self._decode(appstruct)
+                    result = appstruct.tobytes()
                 else:
-                    result = unicode(appstruct)
+                    result = unicode(appstruct, encoding).encode(encoding)
+            else:
+                result = unicode(appstruct)
             return result
         except Exception, e:
             raise Invalid(node,
@@ -906,13 +2033,39 @@ class String(SchemaType):
         if not cstruct:
             return null
 
-        try:
+        if isinstance(cstruct, unicode):
             result = cstruct
-            if not isinstance(result, unicode):
-                if self.encoding:
-                    result = unicode(str(cstruct), self.encoding)
+        else:
+            result = self._convert(node, cstruct)
+
+        max_length = _limit(self.max_length, 'max_length')
+        if max_length is not None and len(result) > max_length:
+            raise LimitExceeded(
+                node,
+                _('String too long (maximum ${max} characters)',
+                  mapping={'max':max_length})
+                )
+
+        validator = getattr(node, 'validator', None)
+        if isinstance(validator, OneOf):
+            if validator._contains(result):
+                result = self._intern(result)
+        elif self.intern:
+            result = self._intern(result)
+
+        return result
+
+    def _convert(self, node, cstruct):
+        try:
+            if isinstance(cstruct, (str, buffer, _memoryview)):
+                if self.encoding or not isinstance(cstruct, str):
+                    result = self._decode(cstruct)
                 else:
                     result = unicode(cstruct)
+            elif self.encoding:
+                result = self._decode(str(cstruct))
+            else:
+                result = unicode(cstruct)
         except Exception, e:
             raise Invalid(node,
                           _('${val} is not a string: %{err}',
@@ -926,6 +2079,8 @@ class Number(SchemaType):
     """ Abstract base class for float, int, decimal """
 
     num = None
+    # types of cstruct which ``num`` would return unchanged
+    passthrough = ()
 
     def serialize(self, node, appstruct):
         if appstruct is null:
@@ -942,6 +2097,9 @@ class Number(SchemaType):
         if cstruct != 0 and not cstruct:
             return null
 
+        if type(cstruct) in self.passthrough:
+            return cstruct
+
         try:
             return self.num(cstruct)
         except Exception:
@@ -950,9 +2108,18 @@ class Number(SchemaType):
                             mapping={'val':cstruct})
                           )
 
+_integer_re = re.compile(r'\s*[-+]?\d+\s*$')
+
 class Integer(Number):
     """ A type representing an integer.
 
+    The constructor accepts an optional ``strict`` argument.  If it
+    is false (the default), any value which ``int`` accepts is
+    deserialized, including booleans, floats (which are truncated)
+    and numeric strings.  If it is true, only integers and strings
+    which spell out an integer are accepted; other values, including
+    booleans and floats, result in an :exc:`colander.Invalid` error.
+
     If the :attr:`colander.null` value is passed to the serialize
     method of this class, the :attr:`colander.null` value will be
     returned.
@@ -961,6 +2128,29 @@ class Integer(Number):
     this type are ignored.
     """
     num = int
+    passthrough = (int, long)
+    strict = False
+
+    def __init__(self, strict=False):
+        self.strict = strict
+
+    def deserialize(self, node, cstruct):
+        if cstruct != 0 and not cstruct:
+            return null
+
+        if type(cstruct) in self.passthrough:
+            return cstruct
+
+        if isinstance(cstruct, basestring) and _integer_re.match(cstruct):
+            return int(cstruct)
+
+        if self.strict:
+            raise Invalid(node,
+                          _('"${val}" is not an integer',
+                            mapping={'val':cstruct})
+                          )
+
+        return Number.deserialize(self, node, cstruct)
 
 Int = Integer
 
@@ -975,6 +2165,7 @@ class Float(Number):
     this type are ignored.
     """
     num = float
+    passthrough = (float,)
 
 class Decimal(Number):
     """ A type representing a decimal floating point.  Deserialization
@@ -986,19 +2177,228 @@ class Decimal(Number):
 
     The subnodes of the :class:`colander.SchemaNode` that wraps
     this type are ignored.
+
+    The constructor accepts these optional arguments:
+
+    ``quant``
+        If not ``None`` (the default), a decimal or a string such as
+        ``'0.01'`` giving the exponent to which values are quantized
+        (see ``decimal.Decimal.quantize``), both during
+        deserialization and serialization.
+
+    ``rounding``
+        The rounding mode used for quantization, e.g.
+        ``decimal.ROUND_HALF_UP``.  If ``None`` (the default), the
+        rounding mode of ``context`` is used.
+
+    ``context``
+        The ``decimal.Context`` used for quantization.  If ``None``
+        (the default), the current thread's context is used.
+
+    A value which cannot be quantized (for instance because the result
+    would exceed the precision of the context) is not considered a
+    valid number.
     """
+    passthrough = (decimal.Decimal,)
+    quant = rounding = context = None
+
+    def __init__(self, quant=None, rounding=None, context=None):
+        if quant is not None:
+            quant = decimal.Decimal(quant)
+            # values of the right type still need to be quantized
+            self.passthrough = ()
+        self.quant = quant
+        self.rounding = rounding
+        self.context = context
+
     def num(self, val):
-        return decimal.Decimal(str(val))
+        if isinstance(val, decimal.Decimal):
+            result = val
+        elif isinstance(val, basestring) or type(val) in (int, long):
+            result = decimal.Decimal(val)
+        else:
+            # floats are converted through their shortest string form
+            # rather than their exact binary value
+            result = decimal.Decimal(str(val))
+        if self.quant is not None:
+            result = result.quantize(self.quant, rounding=self.rounding,
+                                     context=self.context)
+        return result
+
+class NumberArray(Positional, SchemaType):
+    """ Abstract base class for the numeric array types.
+
+    A numeric array type deserializes an iterable of numbers (or of
+    numeric strings) in bulk into an ``array.array``, rather than into
+    a list by deserializing each element through a subnode as
+    :class:`colander.Sequence` does.  The subnodes of the
+    :class:`colander.SchemaNode` that wraps a numeric array type are
+    ignored.
+
+    The constructor accepts these optional arguments:
+
+    ``min`` and ``max``
+        Bounds checked against every element after deserialization,
+        like :class:`colander.Range` would check them against a single
+        number.  ``None`` (the default) means no bound.
+
+    ``numpy``
+        If true, deserialization returns a NumPy array (sharing the
+        memory of the ``array.array``) instead; NumPy must be
+        installed.  Default: ``False``.
+
+    If any element cannot be converted, does not fit in the array or
+    is out of bounds, an :exc:`colander.Invalid` error is raised which
+    has a child error for each offending element, positioned at its
+    index.
+
+    Serialization produces a list of strings, like a
+    :class:`colander.Sequence` of the corresponding number type would.
+
+    If the :attr:`colander.null` value is passed to the serialize
+    method of this class, the :attr:`colander.null` value will be
+    returned.
+    """
+    num = None
+    typecode = None
+
+    def __init__(self, min=None, max=None, numpy=False):
+        self.min = min
+        self.max = max
+        self.numpy = numpy
+
+    def _convert(self, node, cstruct):
+        # convert the elements one at a time, returning the array of the
+        # elements which could be converted, the index of each of them
+        # and the errors of the others by index
+        num = self.num
+        result = array.array(self.typecode)
+        append = result.append
+        indexes = []
+        errors = {}
+        for index, value in enumerate(cstruct):
+            try:
+                number = num(value)
+            except Exception:
+                errors[index] = Invalid(node,
+                                        _('"${val}" is not a number',
+                                          mapping={'val':value}))
+                continue
+            try:
+                append(number)
+            except OverflowError:
+                errors[index] = Invalid(node,
+                                        _('"${val}" is out of range',
+                                          mapping={'val':value}))
+                continue
+            indexes.append(index)
+        return result, indexes, errors
+
+    def _check_range(self, node, result, indexes=None, errors=None):
+        # raise the errors of the elements which are out of bounds along
+        # with any ``errors`` of elements which could not be converted;
+        # ``indexes`` maps positions in ``result`` to element indexes
+        if errors is None:
+            errors = {}
+        failures = Range(self.min, self.max).validate_items(node, result)
+        for pos, e in failures:
+            if indexes is not None:
+                pos = indexes[pos]
+            errors[pos] = e
+        if errors:
+            error = Invalid(node)
+            for index in sorted(errors):
+                error.add(errors[index], index)
+            raise error
+
+    def serialize(self, node, appstruct):
+        if appstruct is null:
+            return null
+
+        try:
+            return [str(self.num(value)) for value in appstruct]
+        except Exception:
+            raise Invalid(node,
+                          _('"${val}" is not a sequence of numbers',
+                            mapping={'val':appstruct}),
+                          )
+
+    def deserialize(self, node, cstruct):
+        if cstruct is null:
+            return null
+
+        if not hasattr(cstruct, '__iter__') or hasattr(cstruct, 'get'):
+            raise Invalid(node, _('"${val}" is not iterable',
+                                  mapping={'val':cstruct}))
+        if not isinstance(cstruct, (list, tuple, array.array)):
+            cstruct = list(cstruct)
+        try:
+            # fast path: the elements are already numbers
+            result = array.array(self.typecode, cstruct)
+        except (TypeError, ValueError, OverflowError):
+            result, indexes, errors = self._convert(node, cstruct)
+            if errors:
+                # report the elements out of bounds too
+                self._check_range(node, result, indexes, errors)
+
+        if self.numpy:
+            import numpy as np
+            result = np.frombuffer(result, dtype=self.typecode)
+
+        self._check_range(node, result)
+        return result
+
+class IntArray(NumberArray):
+    """ A numeric array type whose elements are integers, stored in
+    an ``array.array`` of typecode ``l``.  See
+    :class:`colander.NumberArray`."""
+    num = int
+    typecode = 'l'
+
+class FloatArray(NumberArray):
+    """ A numeric array type whose elements are floats, stored in an
+    ``array.array`` of typecode ``d``.  See
+    :class:`colander.NumberArray`."""
+    num = float
+    typecode = 'd'
+
+def _boolean_choices(false_choices, true_choices):
+    # the lookup table used by Boolean.deserialize
+    choices = {}
+    for choice in true_choices:
+        choices[choice.lower()] = True
+    for choice in false_choices:
+        choices[choice.lower()] = False
+    return choices
 
 class Boolean(SchemaType):
     """ A type representing a boolean object.
 
-    During deserialization, a value in the set (``false``, ``0``) will
-    be considered ``False``.  Anything else is considered
-    ``True``. Case is ignored.
+    During deserialization, a value in ``false_choices`` will be
+    considered ``False`` and a value in ``true_choices`` will be
+    considered ``True``.  Case is ignored.  Values which are already
+    booleans are returned unchanged.  What happens to any other value
+    depends on ``strict``: if it is false (the default), the value is
+    considered ``True``; if it is true, an :exc:`colander.Invalid`
+    error is raised.
 
-    Serialization will produce ``true`` or ``false`` based on the
-    value.
+    The constructor accepts these optional arguments:
+
+    ``false_choices``
+        A sequence of strings considered ``False``.  Default:
+        ``('false', '0')``.
+
+    ``true_choices``
+        A sequence of strings considered ``True``.  Default:
+        ``('true', '1')``.
+
+    ``strict``
+        Whether a value in neither ``false_choices`` nor
+        ``true_choices`` is an error.  Default: ``False``.
+
+    Serialization will produce the first of ``true_choices`` or the
+    first of ``false_choices`` (by default ``true`` or ``false``)
+    based on the value, so that the result can be deserialized again.
 
     If the :attr:`colander.null` value is passed to the serialize
     method of this class, the :attr:`colander.null` value will be
@@ -1007,31 +2407,122 @@ class Boolean(SchemaType):
     The subnodes of the :class:`colander.SchemaNode` that wraps
     this type are ignored.
     """
+    false_choices = ('false', '0')
+    true_choices = ('true', '1')
+    strict = False
+    choices = _boolean_choices(false_choices, true_choices)
+
+    def __init__(self, false_choices=('false', '0'),
+                 true_choices=('true', '1'), strict=False):
+        self.false_choices = false_choices
+        self.true_choices = true_choices
+        self.strict = strict
+        self.choices = _boolean_choices(false_choices, true_choices)
 
     def serialize(self, node, appstruct):
         if appstruct is null:
             return null
 
-        return appstruct and 'true' or 'false'
+        if appstruct:
+            return self.true_choices[0]
+        return self.false_choices[0]
 
     def deserialize(self, node, cstruct):
         if cstruct is null:
             return null
 
+        if type(cstruct) is bool:
+            return cstruct
+
+        if isinstance(cstruct, basestring):
+            result = cstruct
+        else:
+            try:
+                result = str(cstruct)
+            except:
+                raise Invalid(node,
+                              _('${val} is not a string',
+                                mapping={'val':cstruct})
+                              )
+
+        choices = self.choices
+        value = choices.get(result)
+        if value is None:
+            value = choices.get(result.lower())
+            if value is None:
+                if self.strict:
+                    raise Invalid(
+                        node,
+                        _('"${val}" is neither in (${false_choices}) '
+                          'nor in (${true_choices})',
+                          mapping={'val':cstruct,
+                                   'false_choices':', '.join(
+                                       self.false_choices),
+                                   'true_choices':', '.join(
+                                       self.true_choices)})
+                        )
+                value = True
+
+        return value
+
+Bool = Boolean
+
+class Enum(SchemaType):
+    """ A type representing one of a fixed set of application values,
+    each of which is represented by a string in the cstruct.
+
+    ``choices`` is either a dictionary mapping each cstruct string to
+    the corresponding application value, or a sequence of ``(cstruct,
+    appstruct)`` pairs.  The application values must be hashable.
+
+    Deserialization looks the cstruct up in a dictionary built when the
+    type is constructed and returns the corresponding application
+    value; serialization does the reverse.  A value which is not one of
+    the choices results in an :exc:`colander.Invalid` error.  An empty
+    string which is not one of the choices deserializes to
+    :attr:`colander.null`.
+
+    If the :attr:`colander.null` value is passed to the serialize
+    method of this class, the :attr:`colander.null` value will be
+    returned.
+
+    The subnodes of the :class:`colander.SchemaNode` that wraps
+    this type are ignored.
+    """
+    def __init__(self, choices):
+        if hasattr(choices, 'items'):
+            choices = choices.items()
+        self.choices = list(choices)
+        self.values = dict(self.choices)
+        self.names = dict([(v, k) for k, v in self.choices])
+        self.names_msg = ', '.join([k for k, v in self.choices])
+
+    def serialize(self, node, appstruct):
+        if appstruct is null:
+            return null
+
         try:
-            result = str(cstruct)
-        except:
+            return self.names[appstruct]
+        except (KeyError, TypeError):
             raise Invalid(node,
-                          _('${val} is not a string', mapping={'val':cstruct})
+                          _('"${val}" is not one of the choices',
+                            mapping={'val':appstruct})
                           )
-        result = result.lower()
 
-        if result in ('false', '0'):
-            return False
-
-        return True
+    def deserialize(self, node, cstruct):
+        if cstruct is null:
+            return null
 
-Bool = Boolean
+        try:
+            return self.values[cstruct]
+        except (KeyError, TypeError):
+            if not cstruct:
+                return null
+            raise Invalid(node,
+                          _('"${val}" is not one of ${choices}',
+                            mapping={'val':cstruct,
+                                     'choices':self.names_msg})
+                          )
 
 class GlobalObject(SchemaType):
     """ A type representing an importable Python object.  This type
@@ -1397,6 +2888,12 @@ class Time(SchemaType):
                                   )
         return result
 
+_column_typecodes = {
+    Integer:'l',
+    Float:'d',
+    Boolean:'b',
+    }
+
 def timeparse(t, format):
     return datetime.datetime(*time.strptime(t, format)[0:6]).time()
 
@@ -1490,6 +2987,7 @@ class SchemaNode(object):
         self.after_bind = kw.pop('after_bind', None)
         self.__dict__.update(kw)
         self.children = list(children)
+        self._cache = {}
 
     @property
     def required(self):
@@ -1504,7 +3002,8 @@ class SchemaNode(object):
             return True
         return self.missing is required
 
-    def serialize(self, appstruct=null):
+    def serialize(self, appstruct=null, only=None, exclude=None,
+                  sparse=False):
         """ Serialize the :term:`appstruct` to a :term:`cstruct` based
         on the schema represented by this node and return the
         cstruct.
@@ -1515,7 +3014,21 @@ class SchemaNode(object):
 
         If an ``appstruct`` argument is not explicitly provided, it
         defaults to :attr:`colander.null`.
+
+        If ``only`` or ``exclude`` is provided, the ``appstruct`` is
+        serialized using the projection of this schema returned by
+        :meth:`colander.SchemaNode.project` for those arguments instead
+        of using this schema itself; only the selected dotted names
+        appear in the resulting cstruct.
+
+        If ``sparse`` is true, every :class:`colander.Mapping` in the
+        schema serializes as if its ``sparse`` attribute was true: keys
+        whose serialization is :attr:`colander.null` are omitted from
+        the cstruct.
         """
+        if only is not None or exclude is not None or sparse:
+            return self._derive(only, exclude, sparse).serialize(appstruct)
+
         if appstruct is null:
             appstruct = self.default
         if isinstance(appstruct, deferred): # unbound schema with deferreds
@@ -1549,7 +3062,8 @@ class SchemaNode(object):
         specified by the dotted_name path."""
         return self.typ.get_value(self, appstruct, dotted_name)
 
-    def deserialize(self, cstruct=null):
+    def deserialize(self, cstruct=null, only=None, exclude=None,
+                    deadline=None, budget=None, limits=None, iterative=False):
         """ Deserialize the :term:`cstruct` into an :term:`appstruct` based
         on the schema, run this :term:`appstruct` through the
         preparer, if one is present, then validate the
@@ -1572,9 +3086,86 @@ class SchemaNode(object):
 
         If a ``cstruct`` argument is not explicitly provided, it
         defaults to :attr:`colander.null`.
+
+        If ``only`` or ``exclude`` is provided, the ``cstruct`` is
+        deserialized using the projection of this schema returned by
+        :meth:`colander.SchemaNode.project` for those arguments instead
+        of using this schema itself.
+
+        If ``deadline`` (a time as returned by ``time.time()``) or
+        ``budget`` (a number of seconds from now) is provided, the
+        deserialization of mappings, sequences and tuples is aborted
+        with a :exc:`colander.DeadlineExceeded` error as soon as it
+        notices that the (earlier) deadline has passed.  The deadline
+        is checked before each subnode or item is deserialized; the
+        time spent in a single type or validator is not bounded.  When
+        deserializations with deadlines are nested, the earliest
+        deadline applies.
+
+        If ``limits`` (a :class:`colander.Limits` instance) is provided,
+        input which exceeds them aborts the deserialization with a
+        :exc:`colander.LimitExceeded` error.  When deserializations with
+        limits are nested, the limits of the outermost one apply.
+
+        If ``iterative`` is true, nested mappings, sequences and tuples
+        are deserialized by a loop which keeps track of the containers
+        in progress on a stack of its own rather than by recursive
+        calls, so that the nesting depth of the cstruct is not bounded
+        by the Python recursion limit (which matters for deeply nested
+        cstructs of self-referential schemas).  The result, or the
+        error raised, is the same as without ``iterative``.  Subnodes
+        whose type is not exactly :class:`colander.Mapping`,
+        :class:`colander.Sequence` or :class:`colander.Tuple`, lazy
+        mappings, mappings with an ``executor`` and subnodes of
+        :class:`colander.SchemaNode` subclasses which override
+        ``deserialize`` are still deserialized recursively.
         """
-        appstruct = self.typ.deserialize(self, cstruct)
+        if limits is not None and getattr(_run_state, 'limits', None) is None:
+            _run_state.limits = limits
+            _run_state.nodes = 0
+            _run_state.depth = 0
+            try:
+                return self.deserialize(cstruct, only, exclude, deadline,
+                                        budget, iterative=iterative)
+            finally:
+                _run_state.limits = None
+
+        if budget is not None:
+            end = time.time() + budget
+            if deadline is None or end < deadline:
+                deadline = end
+
+        if deadline is not None:
+            previous = _deadline()
+            if previous is None or deadline < previous:
+                _run_state.deadline = deadline
+                try:
+                    return self.deserialize(cstruct, only, exclude,
+                                            iterative=iterative)
+                finally:
+                    _run_state.deadline = previous
+
+        if only is not None or exclude is not None:
+            return self.project(only, exclude).deserialize(
+                cstruct, iterative=iterative)
+
+        if iterative:
+            return _deserialize_iterative(self, cstruct)
 
+        appstruct, validate = self._deserialize(cstruct)
+
+        if validate and self.validator is not None:
+            if not isinstance(self.validator, deferred): # unbound
+                self.validator(self, appstruct)
+        return appstruct
+
+    def _deserialize(self, cstruct):
+        # deserialize and prepare the cstruct, returning the appstruct
+        # and whether it still needs to be validated
+        return self._prepare(self.typ.deserialize(self, cstruct))
+
+    def _prepare(self, appstruct):
+        # prepare the appstruct returned by type deserialization
         if self.preparer is not None:
             appstruct = self.preparer(appstruct)
 
@@ -1585,16 +3176,145 @@ class SchemaNode(object):
             if isinstance(appstruct, deferred): # unbound schema with deferreds
                 raise Invalid(self, _('Required'))
             # We never deserialize or validate the missing value
-            return appstruct
+            return appstruct, False
+
+        return appstruct, True
+
+    def deserialize_chunked(self, cstruct=null, chunk_size=1000):
+        """ Return a :class:`colander.ChunkedDeserializer` which
+        deserializes the :term:`cstruct` like
+        :meth:`colander.SchemaNode.deserialize` would, a chunk of
+        ``chunk_size`` sequence items at a time, when it is iterated
+        over."""
+        return ChunkedDeserializer(self, cstruct, chunk_size)
+
+    def deserialize_columns(self, records, numpy=False):
+        """ Deserialize a batch of mapping cstructs (any iterable of
+        them) using this node, which must have a
+        :class:`colander.Mapping` type, and return the result in
+        columnar form: a three-tuple of ``(columns, valid, errors)``.
+
+        ``columns`` is a dictionary mapping the name of each subnode
+        to the sequence of values deserialized for it, in row order.
+        The column of an :class:`colander.Integer`,
+        :class:`colander.Float` or :class:`colander.Boolean` subnode
+        is an ``array.array`` (of typecode ``l``, ``d`` and ``b``
+        respectively), unless one of its values cannot be stored in
+        such an array (e.g. a ``None`` missing value), in which case
+        it is a list; other columns are lists.
+
+        ``valid`` is a list containing ``True`` for each row which was
+        deserialized successfully and ``False`` for each row which was
+        not.  The values stored in the columns for an invalid row are
+        placeholders: zero in arrays and :attr:`colander.null` in
+        lists.
+
+        ``errors`` is a dictionary mapping the index of each invalid
+        row to the :exc:`colander.Invalid` exception raised for it,
+        which has the same shape as the exception ``deserialize`` would
+        raise for that row.
+
+        No dictionary is built for a row unless this node has a
+        preparer or a validator.
+
+        If ``numpy`` is true, array columns and ``valid`` are returned
+        as NumPy arrays instead (array columns are converted without
+        copying); NumPy must be installed.
+        """
+        typ = self.typ
+        if not isinstance(typ, Mapping):
+            raise ValueError('deserialize_columns requires a mapping schema')
+
+        children = self.children
+        names = [child.name for child in children]
+        nameset = set(names)
+        columns = []
+        placeholders = []
+        for child in children:
+            typecode = _column_typecodes.get(child.typ.__class__)
+            if typecode is None:
+                columns.append([])
+                placeholders.append(null)
+            else:
+                columns.append(array.array(typecode))
+                placeholders.append(0)
+        preparer = self.preparer
+        validator = self.validator
+        if isinstance(validator, deferred): # unbound
+            validator = None
+        valid = []
+        errors = {}
 
-        if self.validator is not None:
-            if not isinstance(self.validator, deferred): # unbound
-                self.validator(self, appstruct)
-        return appstruct
+        for row, record in enumerate(records):
+            values = []
+            error = None
+            try:
+                if record is null:
+                    raise Invalid(self, _('Required'))
+                if not isinstance(record, dict):
+                    record = typ._validate(self, record)
+                for num, child in enumerate(children):
+                    try:
+                        values.append(
+                            child.deserialize(record.get(child.name, null)))
+                    except Aborted:
+                        raise
+                    except Invalid, e:
+                        if error is None:
+                            error = Invalid(self)
+                        error.add(e, num)
+                if typ.unknown == 'raise':
+                    extra = dict([(k, v) for (k, v) in record.items()
+                                  if k not in nameset])
+                    if extra:
+                        raise Invalid(
+                            self,
+                            _('Unrecognized keys in mapping: "${val}"',
+                              mapping={'val':extra})
+                            )
+                if error is not None:
+                    raise error
+                if preparer is not None or validator is not None:
+                    appstruct = dict(zip(names, values))
+                    if preparer is not None:
+                        appstruct = preparer(appstruct)
+                    if validator is not None:
+                        validator(self, appstruct)
+                    values = [appstruct.get(name, null) for name in names]
+            except Aborted:
+                raise
+            except Invalid, e:
+                errors[row] = e
+                values = placeholders
+                valid.append(False)
+            else:
+                valid.append(True)
+
+            for num, value in enumerate(values):
+                column = columns[num]
+                try:
+                    column.append(value)
+                except (TypeError, OverflowError):
+                    column = columns[num] = list(column)
+                    column.append(value)
+
+        if numpy:
+            import numpy as np
+            for num, column in enumerate(columns):
+                if isinstance(column, array.array):
+                    if column.typecode == 'b':
+                        dtype = np.bool_
+                    else:
+                        dtype = column.typecode
+                    columns[num] = np.frombuffer(column, dtype=dtype)
+            valid = np.array(valid, dtype=np.bool_)
+
+        return dict(zip(names, columns)), valid, errors
 
     def add(self, node):
         """ Add a subnode to this node. """
         self.children.append(node)
+        self._cache.clear()
 
     def clone(self):
         """ Clone the schema node and return the clone.  All subnodes
@@ -1603,8 +3323,52 @@ class SchemaNode(object):
         cloned = self.__class__(self.typ)
         cloned.__dict__.update(self.__dict__)
         cloned.children = [ node.clone() for node in self.children ]
+        cloned._cache = {}
         return cloned
 
+    _cache_size = 100
+
+    def project(self, only=None, exclude=None):
+        """ Return a projection of this schema: a node which behaves
+        like this one, but which has only the subnodes named by the
+        dotted names in ``only`` (if it is not ``None``), less the
+        subnodes named by the dotted names in ``exclude`` (if it is not
+        ``None``).  Dotted names are relative to this node, e.g.
+        ``['id', 'meta.created']``.  A dotted name which crosses a
+        sequence node names a subnode of the sequence's item node
+        (e.g. ``phones.number``).  A :exc:`KeyError` is raised if a
+        dotted name does not refer to a subnode, and a :exc:`TypeError`
+        if ``only`` or ``exclude`` is a single string rather than a
+        sequence of dotted names.
+
+        Subtrees which are not named are skipped entirely during
+        serialization and deserialization of the projection; their
+        validators and required checks are not run.  The validator of
+        a mapping node whose children are narrowed by the projection
+        is not run either, as it would only see part of the data, and
+        such a mapping ignores unknown keys.
+
+        Projections are cached per distinct ``only`` and ``exclude``
+        value, so projecting the same node with the same names
+        repeatedly is cheap.  The cache is cleared when subnodes are
+        added, removed or replaced using the methods of this node; it
+        is not cleared when the ``children`` list is mutated directly
+        or when a subnode of this node is changed."""
+        return self._derive(only, exclude, False)
+
+    def _derive(self, only, exclude, sparse):
+        key = (_pathset(only), _pathset(exclude), sparse)
+        cache = self._cache
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        projected = _project(self, key[0], key[1], sparse)
+        if len(cache) >= self._cache_size:
+            cache.clear()
+        cache[key] = projected
+        return projected
+
     def bind(self, **kw):
         """ Resolve any deferred values attached to this schema node
         and its children (recursively), using the keywords passed as
@@ -1630,6 +3394,7 @@ class SchemaNode(object):
         """ Remove a subnode by name """
         for idx, node in enumerate(self.children[:]):
             if node.name == name:
+                self._cache.clear()
                 return self.children.pop(idx)
         raise KeyError(name)
 
@@ -1646,6 +3411,7 @@ class SchemaNode(object):
             if node.name == name:
                 self.children[idx] = newnode
                 newnode.name = name
+                self._cache.clear()
                 return node
         raise KeyError(name)
 
@@ -1668,6 +3434,331 @@ class SchemaNode(object):
             self.name,
             )
 
+class ChunkedDeserializer(object):
+    """ Deserializes a :term:`cstruct` using a schema node a chunk at a
+    time, so that the deserialization of a very long sequence can be
+    interleaved with other work (for instance by an event loop which
+    runs other tasks between chunks).  Instances are usually created by
+    :meth:`colander.SchemaNode.deserialize_chunked`.
+
+    Iterating over the instance performs the deserialization, keeping
+    the mappings, sequences and tuples in progress on a stack of its
+    own, like :meth:`colander.SchemaNode.deserialize` does when its
+    ``iterative`` argument is true.  The items of the sequences found
+    anywhere in the cstruct (for instance the list of records in a
+    mapping which wraps them) are deserialized ``chunk_size`` at a
+    time: a ``(done, total)`` tuple giving the number of sequence items
+    deserialized so far and the number of items of the sequences
+    encountered so far is yielded after every ``chunk_size`` items, and
+    before the outermost sequence being deserialized is finished if
+    some of its items were deserialized since.  Nothing is yielded for
+    a cstruct without sequence items.  A cstruct which the node does
+    not deserialize through the stack (because the type of the node is
+    not exactly :class:`colander.Mapping`, :class:`colander.Sequence`
+    or :class:`colander.Tuple`, the cstruct is :attr:`colander.null`
+    or the class of the node overrides ``deserialize``) is
+    deserialized in one step, after which ``(1, 1)`` is yielded.
+
+    When the iteration is over, the appstruct is available as the
+    ``result`` attribute of the instance.  If the cstruct is invalid,
+    the last step of the iteration raises the same
+    :exc:`colander.Invalid` error as
+    :meth:`colander.SchemaNode.deserialize` would have, after all the
+    items have been deserialized.
+
+    The ``run`` method performs the whole iteration and returns the
+    result.
+    """
+    def __init__(self, node, cstruct=null, chunk_size=1000):
+        self.node = node
+        self.cstruct = cstruct
+        self.chunk_size = chunk_size
+        self.done = 0
+        self.total = None
+        self.result = null
+
+    def __iter__(self):
+        node = self.node
+        cstruct = self.cstruct
+        frame = None
+        if _plain(node):
+            frame = _open(node, cstruct, True)
+
+        if frame is None:
+            self.total = 1
+            self.result = node.deserialize(cstruct)
+            self.done = 1
+            yield self.done, self.total
+            return
+
+        for progress in self._steps(frame):
+            yield progress
+
+    def _steps(self, frame):
+        # deserialize with the frame of the node and the frames of its
+        # subnodes, setting the result at the end; yield the progress
+        # after every chunk_size sequence items (never if it is None)
+        chunk_size = self.chunk_size
+        self.done = self.total = 0
+        stack = [frame]
+        sequences = 0 # sequence frames on the stack
+        pending = 0 # sequence items deserialized since the last yield
+        if frame.items:
+            sequences = 1
+            self.total += frame.count
+
+        while True:
+            request = frame.next()
+            error = None
+
+            if request is None:
+                if frame.items:
+                    if sequences == 1 and pending and chunk_size is not None:
+                        pending = 0
+                        yield self.done, self.total
+                    sequences -= 1
+                stack.pop()
+                try:
+                    appstruct = frame.finish()
+                except Aborted:
+                    raise
+                except Invalid, e:
+                    if not stack:
+                        raise
+                    error = e
+                if not stack:
+                    self.result = appstruct
+                    return
+                frame = stack[-1]
+
+            else:
+                subnode, subcstruct, full = request
+                subframe = None
+                try:
+                    if _plain(subnode):
+                        subframe = _open(subnode, subcstruct, full)
+                    if subframe is None:
+                        if full:
+                            appstruct = subnode.deserialize(subcstruct)
+                        else:
+                            appstruct = subnode._deserialize(subcstruct)
+                except Aborted:
+                    raise
+                except Invalid, e:
+                    error = e
+                if subframe is not None:
+                    stack.append(subframe)
+                    frame = subframe
+                    if frame.items:
+                        sequences += 1
+                        self.total += frame.count
+                    continue
+
+            if error is None:
+                frame.receive(appstruct)
+            else:
+                frame.fail(error)
+
+            if frame.items:
+                self.done += 1
+                pending += 1
+                if pending == chunk_size:
+                    pending = 0
+                    yield self.done, self.total
+
+    def run(self):
+        """ Perform the whole deserialization and return the
+        result. """
+        for progress in self:
+            pass
+        return self.result
+
+class _Frame(object):
+    # a container node being deserialized by ChunkedDeserializer._steps.
+    # ``next`` returns the next ``(subnode, subcstruct, full)`` to
+    # deserialize (fully, like subnode.deserialize, or else like
+    # subnode._deserialize) or None when there are no more, its outcome
+    # is passed to ``receive`` or ``fail``, and ``finish`` returns the
+    # result of the node.  ``items`` tells whether the subnodes
+    # deserialized are sequence items, ``count`` of them.
+    num = -1
+    items = False
+
+    def __init__(self, node, full):
+        self.node = node
+        self.full = full
+
+    def accepts(cls, typ):
+        return True
+    accepts = classmethod(accepts)
+
+    def complete(self, result):
+        node = self.node
+        appstruct, validate = node._prepare(result)
+        if not self.full:
+            return appstruct, validate
+        if validate and node.validator is not None:
+            if not isinstance(node.validator, deferred): # unbound
+                node.validator(node, appstruct)
+        return appstruct
+
+class _MappingFrame(_Frame):
+    def __init__(self, node, cstruct, full):
+        _Frame.__init__(self, node, full)
+        typ = node.typ
+        cstruct = typ._check_keys(node, cstruct)
+        self.value, self.getter = typ._source(node, cstruct)
+        self.count = len(node.children)
+        self.result = {}
+        self.error = None
+        self.guarded = _guarded()
+        if self.guarded:
+            _enter(node)
+
+    def accepts(cls, typ):
+        return not typ.lazy and typ.executor is None
+    accepts = classmethod(accepts)
+
+    def next(self):
+        num = self.num + 1
+        if num == self.count:
+            return None
+        self.num = num
+        if self.guarded:
+            _check_run(self.node)
+        subnode = self.node.children[num]
+        return subnode, self.getter(subnode.name, null), True
+
+    def receive(self, appstruct):
+        self.result[self.node.children[self.num].name] = appstruct
+
+    def fail(self, e):
+        if self.error is None:
+            self.error = Invalid(self.node)
+        self.error.add(e, self.num)
+
+    def finish(self):
+        node = self.node
+        if self.guarded:
+            _leave()
+        node.typ._leftover(node, self.value, self.result)
+        if self.error is not None:
+            raise self.error
+        return self.complete(node.typ._construct(node, self.result))
+
+class _TupleFrame(_Frame):
+    def __init__(self, node, cstruct, full):
+        _Frame.__init__(self, node, full)
+        self.value = node.typ._validate(node, cstruct)
+        self.count = len(node.children)
+        self.result = []
+        self.error = None
+        self.guarded = _guarded()
+        if self.guarded:
+            _enter(node)
+
+    def next(self):
+        num = self.num + 1
+        if num == self.count:
+            return None
+        self.num = num
+        if self.guarded:
+            _check_run(self.node)
+        return self.node.children[num], self.value[num], True
+
+    def receive(self, appstruct):
+        self.result.append(appstruct)
+
+    def fail(self, e):
+        if self.error is None:
+            self.error = Invalid(self.node)
+        self.error.add(e, self.num)
+
+    def finish(self):
+        if self.guarded:
+            _leave()
+        if self.error is not None:
+            raise self.error
+        return self.complete(tuple(self.result))
+
+class _SequenceFrame(_Frame):
+    items = True
+
+    def __init__(self, node, cstruct, full):
+        _Frame.__init__(self, node, full)
+        typ = node.typ
+        self.validate_items = typ._validate_items(node)
+        self.value = typ._validate(node, cstruct, typ.accept_scalar,
+                                   _limit(typ.max_items, 'max_items'))
+        self.count = len(self.value)
+        self.result = []
+        self.errors = {}
+        # the indexes and appstructs of the items to validate at once
+        self.indexes = []
+        self.checked = []
+        self.guarded = False
+        if self.count:
+            self.subnode = node.children[0]
+            self.guarded = _guarded()
+            if self.guarded:
+                _enter(node)
+
+    def next(self):
+        num = self.num + 1
+        if num == self.count:
+            return None
+        self.num = num
+        if self.guarded:
+            _check_run(self.node)
+        return self.subnode, self.value[num], self.validate_items is None
+
+    def receive(self, appstruct):
+        if self.validate_items is not None:
+            appstruct, validate = appstruct
+            if validate:
+                self.indexes.append(self.num)
+                self.checked.append(appstruct)
+        self.result.append(appstruct)
+
+    def fail(self, e):
+        self.errors[self.num] = e
+
+    def finish(self):
+        node = self.node
+        if self.checked:
+            for pos, e in self.validate_items(self.subnode, self.checked):
+                self.errors[self.indexes[pos]] = e
+        if self.guarded:
+            _leave()
+        return self.complete(node.typ._result(node, self.result,
+                                              self.errors))
+
+_frames = {
+    Mapping:_MappingFrame,
+    Tuple:_TupleFrame,
+    Sequence:_SequenceFrame,
+    }
+
+def _open(node, cstruct, full):
+    # a frame deserializing the cstruct with the node, or None if the
+    # node has to be deserialized in one step
+    frame = _frames.get(type(node.typ))
+    if frame is None or cstruct is null or not frame.accepts(node.typ):
+        return None
+    return frame(node, cstruct, full)
+
+def _deserialize_iterative(node, cstruct):
+    # deserialize the cstruct like node.deserialize(cstruct) does, but
+    # keep the containers in progress on an explicit stack of frames
+    # rather than on the Python stack
+    frame = _open(node, cstruct, True)
+    if frame is None:
+        return _Frame(node, True).complete(node.typ.deserialize(node, cstruct))
+    deserializer = ChunkedDeserializer(node, cstruct, None)
+    for progress in deserializer._steps(frame):
+        pass
+    return deserializer.result
+
 class _SchemaMeta(type):
     def __init__(cls, name, bases, clsattrs):
         nodes = []
@@ -1725,6 +3816,93 @@ class SequenceSchema(object):
 class TupleSchema(Schema):
     schema_type = Tuple
 
+def _pathset(paths):
+    if paths is None:
+        return None
+    if isinstance(paths, basestring):
+        raise TypeError('expected a sequence of dotted names, not the '
+                        'string %r' % (paths,))
+    return frozenset(paths)
+
+def _split_paths(paths):
+    # map each first dotted name element to the remainders found under
+    # it, or to None if a path names the element itself
+    result = {}
+    for path in paths:
+        if '.' in path:
+            name, rest = path.split('.', 1)
+            subpaths = result.setdefault(name, [])
+            if subpaths is not None:
+                subpaths.append(rest)
+        else:
+            result[path] = None
+    return result
+
+def _copy_node(node, children):
+    copied = node.__class__(node.typ)
+    copied.__dict__.update(node.__dict__)
+    copied.children = children
+    copied._cache = {}
+    return copied
+
+def _project(node, only, exclude, sparse=False):
+    typ = node.typ
+
+    if isinstance(typ, Sequence):
+        children = [_project(child, only, exclude, sparse)
+                    for child in node.children]
+        return _copy_node(node, children)
+
+    if not isinstance(typ, Mapping):
+        paths = sorted(list(only or ()) + list(exclude or ()))
+        if paths:
+            raise KeyError(paths[0])
+        if sparse and node.children:
+            children = [_project(child, None, None, sparse)
+                        for child in node.children]
+            return _copy_node(node, children)
+        return node
+
+    names = [child.name for child in node.children]
+    only_map = exclude_map = None
+    if only is not None:
+        only_map = _split_paths(only)
+    if exclude is not None:
+        exclude_map = _split_paths(exclude)
+    for pathmap in (only_map, exclude_map):
+        for name in pathmap or ():
+            if name not in names:
+                raise KeyError(name)
+
+    children = []
+    for child in node.children:
+        name = child.name
+        subonly = subexclude = None
+        if only_map is not None:
+            if name not in only_map:
+                continue
+            subonly = only_map[name]
+        if exclude_map is not None and name in exclude_map:
+            subexclude = exclude_map[name]
+            if subexclude is None:
+                continue
+        if subonly is None and subexclude is None and not sparse:
+            children.append(child)
+        else:
+            children.append(_project(child, subonly, subexclude, sparse))
+
+    projected = _copy_node(node, children)
+    if only is not None or exclude is not None:
+        projected.validator = None
+        if typ.unknown != 'ignore':
+            projected.typ = copy.copy(typ)
+            projected.typ.unknown = 'ignore'
+    if sparse and not typ.sparse:
+        if projected.typ is typ:
+            projected.typ = copy.copy(typ)
+        projected.typ.sparse = True
+    return projected
+
 class deferred(object):
     """ A decorator which can be used to define deferred schema values
     (missing values, widgets, validators, etc.)"""
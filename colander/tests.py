@@ -136,6 +136,58 @@ class TestInvalid(unittest.TestCase):
         exc = self._makeOne(node, 'msg')
         self.assertEqual(exc.messages(), ['msg'])
 
+class Test_LRUCache(unittest.TestCase):
+    def _makeOne(self, maxsize):
+        from colander import _LRUCache
+        return _LRUCache(maxsize)
+
+    def test_get_put(self):
+        cache = self._makeOne(2)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('a', 1), 1)
+        cache.put('a', 'A')
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_put_existing(self):
+        cache = self._makeOne(2)
+        cache.put('a', 'A')
+        cache.put('a', 'B')
+        self.assertEqual(cache.get('a'), 'B')
+        self.assertEqual(len(cache), 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = self._makeOne(2)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        cache.get('a')
+        cache.put('c', 'C')
+        self.assertEqual(sorted(cache.links.keys()), ['a', 'c'])
+        cache.put('d', 'D')
+        self.assertEqual(sorted(cache.links.keys()), ['c', 'd'])
+
+    def test_maxsize_zero(self):
+        cache = self._makeOne(0)
+        cache.put('a', 'A')
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get('a'), None)
+
+    def test_clear(self):
+        cache = self._makeOne(2)
+        cache.put('a', 'A')
+        cache.get('a')
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+        cache.put('b', 'B')
+        self.assertEqual(cache.get('b'), 'B')
+
+    def test_deepcopy(self):
+        import copy
+        cache = self._makeOne(2)
+        self.failUnless(copy.deepcopy(cache) is cache)
+
 class TestAll(unittest.TestCase):
     def _makeOne(self, validators):
         from colander import All
@@ -154,6 +206,50 @@ class TestAll(unittest.TestCase):
         e = invalid_exc(validator, None, None)
         self.assertEqual(e.msg, ['msg1', 'msg2'])
 
+    def test_short_circuit_success(self):
+        from colander import All
+        validator = All(DummyValidator(), DummyValidator(),
+                        short_circuit=True)
+        self.assertEqual(validator(None, None), None)
+
+    def test_short_circuit_failure(self):
+        from colander import All
+        calls = []
+        def validator1(node, value):
+            calls.append(1)
+        validator2 = DummyValidator('msg2')
+        validator3 = DummyValidator('msg3')
+        validator = All(validator1, validator2, validator3,
+                        short_circuit=True)
+        e = invalid_exc(validator, None, None)
+        self.assertEqual(e.msg, ['msg2'])
+        self.assertEqual(calls, [1])
+
+    def test_short_circuit_cost_order(self):
+        from colander import All
+        expensive = DummyValidator('expensive')
+        expensive.cost = 10
+        cheap = DummyValidator('cheap')
+        cheap.cost = 1
+        free = DummyValidator()
+        validator = All(expensive, cheap, free, short_circuit=True)
+        self.assertEqual(validator.ordered, [free, cheap, expensive])
+        self.assertEqual(validator.cost, 11)
+        e = invalid_exc(validator, None, None)
+        self.assertEqual(e.msg, ['cheap'])
+
+    def test_cost_order_ignored_without_short_circuit(self):
+        expensive = DummyValidator('expensive')
+        expensive.cost = 10
+        cheap = DummyValidator('cheap')
+        validator = self._makeOne([expensive, cheap])
+        e = invalid_exc(validator, None, None)
+        self.assertEqual(e.msg, ['expensive', 'cheap'])
+
+    def test_unknown_keyword(self):
+        from colander import All
+        self.assertRaises(TypeError, All, DummyValidator(), fail=True)
+
 class TestFunction(unittest.TestCase):
     def _makeOne(self, *arg, **kw):
         from colander import Function
@@ -163,6 +259,58 @@ class TestFunction(unittest.TestCase):
         validator = self._makeOne(lambda x: True)
         self.assertEqual(validator(None, None), None)
 
+    def test_cost(self):
+        self.assertEqual(self._makeOne(lambda x: True).cost, 0)
+        self.assertEqual(self._makeOne(lambda x: True, cost=5).cost, 5)
+
+    def test_cache(self):
+        calls = []
+        def function(value):
+            calls.append(value)
+            return value != 'bad'
+        validator = self._makeOne(function, cache=10)
+        self.assertEqual(validator(None, 'good'), None)
+        self.assertEqual(validator(None, 'good'), None)
+        invalid_exc(validator, None, 'bad')
+        e = invalid_exc(validator, None, 'bad')
+        self.assertEqual(e.msg, 'Invalid value')
+        self.assertEqual(calls, ['good', 'bad'])
+        self.assertEqual(validator.cache_info(),
+                         {'hits':2, 'misses':2, 'maxsize':10, 'currsize':2})
+        validator.cache_clear()
+        self.assertEqual(validator.cache_info(),
+                         {'hits':0, 'misses':0, 'maxsize':10, 'currsize':0})
+
+    def test_cache_distinguishes_types(self):
+        validator = self._makeOne(lambda x: isinstance(x, int), cache=10)
+        self.assertEqual(validator(None, 1), None)
+        invalid_exc(validator, None, 1.0)
+
+    def test_cache_unhashable(self):
+        calls = []
+        def function(value):
+            calls.append(value)
+            return True
+        validator = self._makeOne(function, cache=10)
+        validator(None, [1])
+        validator(None, [1])
+        self.assertEqual(calls, [[1], [1]])
+        self.assertEqual(validator.cache_info()['currsize'], 0)
+
+    def test_cache_shared_by_copies(self):
+        import copy
+        validator = self._makeOne(lambda x: True, cache=10)
+        validator(None, 1)
+        copied = copy.deepcopy(validator)
+        copied(None, 1)
+        self.failUnless(copied.cache is validator.cache)
+        self.assertEqual(validator.cache_info()['hits'], 1)
+
+    def test_no_cache(self):
+        validator = self._makeOne(lambda x: True)
+        self.assertEqual(validator.cache_info(), None)
+        validator.cache_clear()
+
     def test_fail_function_returns_empty_string(self):
         validator = self._makeOne(lambda x: '')
         e = invalid_exc(validator, None, None)
@@ -224,6 +372,36 @@ class TestRange(unittest.TestCase):
         e = invalid_exc(validator, None, 2)
         self.assertEqual(e.msg, 'wrong')
 
+    def test_validate_items_success(self):
+        validator = self._makeOne(min=0, max=10)
+        self.assertEqual(validator.validate_items(None, [0, 5, 10]), [])
+        self.assertEqual(validator.validate_items(None, []), [])
+        validator = self._makeOne()
+        self.assertEqual(validator.validate_items(None, [-1]), [])
+
+    def test_validate_items_failure(self):
+        validator = self._makeOne(min=0, max=10)
+        failures = validator.validate_items(None, [-1, 5, 11])
+        self.assertEqual([x[0] for x in failures], [0, 2])
+        self.assertEqual(failures[0][1].msg.interpolate(),
+                         '-1 is less than minimum value 0')
+        self.assertEqual(failures[1][1].msg.interpolate(),
+                         '11 is greater than maximum value 10')
+
+    def test_validate_items_numpy(self):
+        try:
+            import numpy
+        except ImportError: # pragma: no cover
+            return
+        validator = self._makeOne(min=0, max=10)
+        values = numpy.array([-1, 5, 11])
+        failures = validator.validate_items(None, values)
+        self.assertEqual([x[0] for x in failures], [0, 2])
+        validator = self._makeOne(max=10)
+        self.assertEqual(validator.validate_items(None, values)[0][0], 2)
+        validator = self._makeOne(min=0)
+        self.assertEqual(validator.validate_items(None, values)[0][0], 0)
+
 class TestRegex(unittest.TestCase):
     def _makeOne(self, pattern):
         from colander import Regex
@@ -247,12 +425,28 @@ class TestRegex(unittest.TestCase):
         self.assertEqual(self._makeOne(regex)(None, '01'), None)
         self.assertRaises(Invalid, self._makeOne(regex), None, 't')
 
+    def test_regex_shared(self):
+        first = self._makeOne('[0-9]+')
+        second = self._makeOne('[0-9]+')
+        self.failUnless(first.match_object is second.match_object)
+
+    def test_flags(self):
+        import re
+        from colander import Regex
+        validator = Regex('a', flags=re.IGNORECASE)
+        self.assertEqual(validator(None, 'A'), None)
+        self.failIf(validator.match_object is self._makeOne('a').match_object)
+
 
 class TestEmail(unittest.TestCase):
     def _makeOne(self):
         from colander import Email
         return Email()
 
+    def test_pattern_shared(self):
+        self.failUnless(
+            self._makeOne().match_object is self._makeOne().match_object)
+
     def test_valid_emails(self):
         validator = self._makeOne()
         self.assertEqual(validator(None, 'me@here.com'), None)
@@ -274,6 +468,54 @@ class TestEmail(unittest.TestCase):
         self.assertRaises(Invalid, validator, None, '@here.us')
         self.assertRaises(Invalid, validator, None, '(name)@here.info')
 
+class TestRegexSet(unittest.TestCase):
+    def _makeOne(self, patterns, msg=None):
+        from colander import RegexSet
+        return RegexSet(patterns, msg=msg)
+
+    def test_success(self):
+        validator = self._makeOne([('lower', '[a-z]+$'), ('short', '.{0,3}$')])
+        self.assertEqual(validator(None, 'abc'), None)
+        self.assertEqual(validator.separate, [])
+
+    def test_failure(self):
+        validator = self._makeOne([('lower', '[a-z]+$'), ('short', '.{0,3}$')])
+        e = invalid_exc(validator, None, 'ABCD')
+        self.assertEqual([x.interpolate() for x in e.msg],
+                         ['String does not match pattern lower',
+                          'String does not match pattern short'])
+
+    def test_failure_custom_msg(self):
+        validator = self._makeOne([('short', '.{0,3}$')],
+                                  msg='${name} failed')
+        e = invalid_exc(validator, None, 'abcd')
+        self.assertEqual([x.interpolate() for x in e.msg], ['short failed'])
+
+    def test_failures_dict(self):
+        validator = self._makeOne({'b':'b', 'a':'a'})
+        self.assertEqual(validator.failures('c'), ['a', 'b'])
+        self.assertEqual(validator.failures('a'), ['b'])
+
+    def test_failures_uncombinable(self):
+        import re
+        validator = self._makeOne([('flag', '(?i)ab'),
+                                   ('back', r'(.)\1'),
+                                   ('named', '(?P<x>a)'),
+                                   ('compiled', re.compile('a+$')),
+                                   ('plain', 'a')])
+        self.assertEqual([x[0] for x in validator.separate],
+                         ['flag', 'back', 'named', 'compiled'])
+        self.assertEqual(validator.failures('AB'),
+                         ['back', 'named', 'compiled', 'plain'])
+        self.assertEqual(validator.failures('aab'), ['flag', 'compiled'])
+
+    def test_failures_too_many_groups(self):
+        patterns = [(str(i), 'a') for i in range(200)]
+        validator = self._makeOne(patterns)
+        self.assertEqual(validator.combined, None)
+        self.assertEqual(len(validator.failures('b')), 200)
+        self.assertEqual(validator.failures('a'), [])
+
 class TestLength(unittest.TestCase):
     def _makeOne(self, min=None, max=None):
         from colander import Length
@@ -305,6 +547,15 @@ class TestLength(unittest.TestCase):
         e = invalid_exc(validator, None, 'ab')
         self.assertEqual(e.msg.interpolate(), 'Longer than maximum length 1')
 
+    def test_validate_items(self):
+        validator = self._makeOne(min=1, max=2)
+        self.assertEqual(validator.validate_items(None, ['a', 'ab']), [])
+        self.assertEqual(validator.validate_items(None, []), [])
+        failures = validator.validate_items(None, ['', 'a', 'abc'])
+        self.assertEqual([x[0] for x in failures], [0, 2])
+        self.assertEqual(failures[1][1].msg.interpolate(),
+                         'Longer than maximum length 2')
+
 class TestOneOf(unittest.TestCase):
     def _makeOne(self, values):
         from colander import OneOf
@@ -319,6 +570,41 @@ class TestOneOf(unittest.TestCase):
         e = invalid_exc(validator, None, None)
         self.assertEqual(e.msg.interpolate(), '"None" is not one of 1, 2')
 
+    def test_validate_items(self):
+        validator = self._makeOne([1, 2])
+        self.assertEqual(validator.validate_items(None, [1, 2, 1]), [])
+        failures = validator.validate_items(None, [1, 3, 2, 4])
+        self.assertEqual([x[0] for x in failures], [1, 3])
+        self.assertEqual(failures[0][1].msg.interpolate(),
+                         '"3" is not one of 1, 2')
+
+    def test_members_frozenset(self):
+        validator = self._makeOne(['b', 'a'])
+        self.assertEqual(validator.members, frozenset(['a', 'b']))
+        self.assertEqual(validator.choices, ['b', 'a'])
+        e = invalid_exc(validator, None, 'c')
+        self.assertEqual(e.msg.interpolate(), '"c" is not one of b, a')
+
+    def test_string_choices(self):
+        validator = self._makeOne('abc')
+        self.assertEqual(validator.members, 'abc')
+        self.assertEqual(validator(None, 'ab'), None)
+        e = invalid_exc(validator, None, 'd')
+        self.assertEqual(e.msg.interpolate(), '"d" is not one of a, b, c')
+        invalid_exc(validator, None, 1)
+
+    def test_unhashable_value(self):
+        validator = self._makeOne([1, 2])
+        e = invalid_exc(validator, None, [1])
+        self.assertEqual(e.msg.interpolate(), '"[1]" is not one of 1, 2')
+
+    def test_unhashable_choices(self):
+        validator = self._makeOne([[1], [2]])
+        self.assertEqual(validator(None, [2]), None)
+        e = invalid_exc(validator, None, [3])
+        self.assertEqual(e.msg.interpolate(),
+                         '"[3]" is not one of [1], [2]')
+
 class TestSchemaType(unittest.TestCase):
     def _makeOne(self, *arg, **kw):
         from colander import SchemaType
@@ -461,6 +747,130 @@ class TestMapping(unittest.TestCase):
         result = typ.serialize(node, {'a':1})
         self.assertEqual(result, {'a':1})
 
+    def test_serialize_sparse(self):
+        from colander import null
+        node = DummySchemaNode(None)
+        node.children = [DummySchemaNode(None, name='a'),
+                         DummySchemaNode(None, name='b')]
+        typ = self._makeOne(sparse=True)
+        result = typ.serialize(node, {'a':1})
+        self.assertEqual(result, {'a':1})
+        result = typ.serialize(node, {'a':1, 'b':null})
+        self.assertEqual(result, {'a':1})
+
+    def test_serialize_sparse_null(self):
+        from colander import null
+        node = DummySchemaNode(None)
+        node.children = [DummySchemaNode(None, name='a')]
+        typ = self._makeOne(sparse=True)
+        result = typ.serialize(node, null)
+        self.assertEqual(result, null)
+
+    def test_serialize_sparse_override(self):
+        from colander import null
+        node = DummySchemaNode(None)
+        node.children = [DummySchemaNode(None, name='a'),
+                         DummySchemaNode(None, name='b')]
+        typ = self._makeOne()
+        self.assertEqual(typ.serialize(node, {'a':1}, sparse=True), {'a':1})
+        typ = self._makeOne(sparse=True)
+        self.assertEqual(typ.serialize(node, {'a':1}, sparse=False),
+                         {'a':1, 'b':null})
+
+    def test_serialize_sparse_subnodes_raise(self):
+        node = DummySchemaNode(None)
+        node.children = [
+            DummySchemaNode(None, name='a', exc='Wrong 1'),
+            DummySchemaNode(None, name='b'),
+            ]
+        typ = self._makeOne(sparse=True)
+        e = invalid_exc(typ.serialize, node, {'b':1})
+        self.assertEqual(len(e.children), 1)
+
+    def test_serialize_attributes(self):
+        from colander import null
+        node = DummySchemaNode(None)
+        node.children = [DummySchemaNode(None, name='a'),
+                         DummySchemaNode(None, name='b')]
+        typ = self._makeOne(unknown='raise', attributes=True)
+        appstruct = Dummy()
+        appstruct.a = 1
+        appstruct.c = 3
+        result = typ.serialize(node, appstruct)
+        self.assertEqual(result, {'a':1, 'b':null})
+
+    def test_serialize_attributes_dict(self):
+        node = DummySchemaNode(None)
+        node.children = [DummySchemaNode(None, name='a')]
+        typ = self._makeOne(unknown='preserve', attributes=True)
+        result = typ.serialize(node, {'a':1, 'b':2})
+        self.assertEqual(result, {'a':1, 'b':2})
+
+    def test_serialize_attributes_subnodes_raise(self):
+        node = DummySchemaNode(None)
+        node.children = [DummySchemaNode(None, name='a', exc='Wrong')]
+        typ = self._makeOne(attributes=True)
+        appstruct = Dummy()
+        appstruct.a = 1
+        e = invalid_exc(typ.serialize, node, appstruct)
+        self.assertEqual(len(e.children), 1)
+
+    def test_serialize_attributes_getters_cached(self):
+        import colander
+        node = colander.SchemaNode(
+            self._makeOne(attributes=True),
+            colander.SchemaNode(colander.Int(), name='a'))
+        appstruct = Dummy()
+        appstruct.a = 1
+        self.assertEqual(node.serialize(appstruct), {'a':'1'})
+        getters = node._cache['getters']
+        self.assertEqual(node.serialize(appstruct), {'a':'1'})
+        self.failUnless(node._cache['getters'] is getters)
+        node.add(colander.SchemaNode(colander.Int(), name='b'))
+        appstruct.b = 2
+        self.assertEqual(node.serialize(appstruct), {'a':'1', 'b':'2'})
+
+    def test_serialize_attributes_children_changed(self):
+        import colander
+        node = colander.SchemaNode(
+            self._makeOne(attributes=True),
+            colander.SchemaNode(colander.Int(), name='a'))
+        appstruct = Dummy()
+        appstruct.a = 1
+        appstruct.b = 2
+        self.assertEqual(node.serialize(appstruct), {'a':'1'})
+        node.children.append(colander.SchemaNode(colander.Int(), name='b'))
+        self.assertEqual(node.serialize(appstruct), {'a':'1', 'b':'2'})
+
+    def test_serialize_attributes_mappings(self):
+        from UserDict import UserDict
+        import colander
+        node = colander.SchemaNode(
+            self._makeOne(attributes=True),
+            colander.SchemaNode(colander.Int(), name='a'))
+        self.assertEqual(node.serialize(UserDict({'a':3})), {'a':'3'})
+        lazy = colander.SchemaNode(
+            self._makeOne(lazy=True),
+            colander.SchemaNode(colander.Int(), name='a'))
+        appstruct = lazy.deserialize({'a':'3'})
+        self.assertEqual(node.serialize(appstruct), {'a':'3'})
+
+    def test_serialize_not_attributes(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        e = invalid_exc(typ.serialize, node, Dummy())
+        self.failUnless(
+            e.msg.interpolate().find('is not a mapping type') > -1)
+
+    def test_serialize_ignore_does_not_mutate(self):
+        node = DummySchemaNode(None)
+        node.children = [DummySchemaNode(None, name='a')]
+        typ = self._makeOne()
+        appstruct = {'a':1, 'b':2}
+        result = typ.serialize(node, appstruct)
+        self.assertEqual(result, {'a':1})
+        self.assertEqual(appstruct, {'a':1, 'b':2})
+
     def test_serialize_with_unknown(self):
         node = DummySchemaNode(None)
         node.children = [
@@ -564,6 +974,336 @@ class TestMapping(unittest.TestCase):
         self.assertEqual(typ.get_value(node1, appstruct, 'node2.foo'), 'bar')
 
 
+class TestMappingFactory(unittest.TestCase):
+    def _makeNode(self, factory, unknown='ignore'):
+        import colander
+        return colander.SchemaNode(
+            colander.Mapping(unknown=unknown, factory=factory),
+            colander.SchemaNode(colander.Int(), name='a'),
+            colander.SchemaNode(colander.String(), name='b'))
+
+    def test_callable(self):
+        class Slotted(object):
+            __slots__ = ('a', 'b')
+            def __init__(self, a, b):
+                self.a = a
+                self.b = b
+        node = self._makeNode(Slotted)
+        result = node.deserialize({'a':'1', 'b':'x'})
+        self.failUnless(isinstance(result, Slotted))
+        self.assertEqual((result.a, result.b), (1, u'x'))
+
+    def test_namedtuple(self):
+        try:
+            from collections import namedtuple
+        except ImportError: # pragma: no cover
+            return
+        Point = namedtuple('Point', 'a b')
+        node = self._makeNode(Point)
+        result = node.deserialize({'a':'1', 'b':'x'})
+        self.assertEqual(result, Point(1, u'x'))
+
+    def test_record(self):
+        from colander import Record
+        node = self._makeNode('record')
+        result = node.deserialize({'a':'1', 'b':'x'})
+        self.failUnless(isinstance(result, Record))
+        self.assertEqual(result.__slots__, ('a', 'b'))
+        self.assertEqual((result.a, result.b), (1, u'x'))
+        other = node.deserialize({'a':'2', 'b':'y'})
+        self.failUnless(type(other) is type(result))
+
+    def test_record_type_cached(self):
+        node = self._makeNode('record')
+        cls = type(node.deserialize({'a':'1', 'b':'x'}))
+        self.failUnless(node._cache['record'][1] is cls)
+        node.add(DummySchemaNode(None, name='c'))
+        self.failIf('record' in node._cache)
+
+    def test_record_type_children_changed(self):
+        import colander
+        node = self._makeNode('record')
+        node.deserialize({'a':'1', 'b':'x'})
+        node.children.append(colander.SchemaNode(colander.Int(), name='c'))
+        result = node.deserialize({'a':'1', 'b':'x', 'c':'2'})
+        self.assertEqual(result.c, 2)
+
+    def test_record_invalid_names(self):
+        import colander
+        for name in ('first-name', 'keys', 'get'):
+            node = colander.SchemaNode(
+                colander.Mapping(factory='record'),
+                colander.SchemaNode(colander.Int(), name=name))
+            self.assertRaises(ValueError, node.deserialize, {name:'1'})
+
+    def test_preserve_rejected(self):
+        self.assertRaises(ValueError, self._makeNode, 'record', 'preserve')
+
+    def test_record_serialize_roundtrip(self):
+        node = self._makeNode('record')
+        result = node.deserialize({'a':'1', 'b':'x'})
+        self.assertEqual(node.serialize(result), {'a':'1', 'b':u'x'})
+
+    def test_invalid(self):
+        node = self._makeNode('record')
+        e = invalid_exc(node.deserialize, {'a':'x', 'b':'x'})
+        self.assertEqual(e.asdict(), {'a':'"x" is not a number'})
+
+    def test_null(self):
+        from colander import null
+        node = self._makeNode('record')
+        self.assertEqual(node.typ.deserialize(node, null), null)
+
+    def test_lazy_wins(self):
+        from colander import LazyMapping
+        node = self._makeNode('record')
+        node.typ.lazy = True
+        result = node.deserialize({'a':'1', 'b':'x'})
+        self.failUnless(isinstance(result, LazyMapping))
+
+class TestMappingExecutor(unittest.TestCase):
+    def _makeNode(self, executor, validators, **kw):
+        import colander
+        node = colander.SchemaNode(colander.Mapping(executor=executor, **kw),
+                                   name='mapping')
+        for name, validator in validators:
+            node.add(colander.SchemaNode(colander.Int(), name=name,
+                                         validator=validator, missing=0))
+        return node
+
+    def _makeValidator(self, msg=None, cost=1):
+        validator = DummyValidator(msg)
+        validator.cost = cost
+        return validator
+
+    def test_submits_expensive_validators(self):
+        executor = DummyExecutor()
+        cheap = self._makeValidator(cost=0)
+        expensive = self._makeValidator()
+        node = self._makeNode(executor, [('a', cheap), ('b', expensive),
+                                         ('c', None)])
+        result = node.deserialize({'a':'1', 'b':'2', 'c':'3'})
+        self.assertEqual(result, {'a':1, 'b':2, 'c':3})
+        self.assertEqual(executor.submitted,
+                         [(expensive, node['b'], 2)])
+        self.assertEqual(executor.futures[0].waited, True)
+
+    def test_missing_not_validated(self):
+        executor = DummyExecutor()
+        node = self._makeNode(executor, [('a', self._makeValidator('a'))])
+        self.assertEqual(node.deserialize({}), {'a':0})
+        self.assertEqual(executor.submitted, [])
+
+    def test_errors_in_child_order(self):
+        executor = DummyExecutor()
+        node = self._makeNode(executor, [('a', self._makeValidator('a')),
+                                         ('b', self._makeValidator('b', 0)),
+                                         ('c', None),
+                                         ('d', self._makeValidator('d'))])
+        e = invalid_exc(node.deserialize,
+                        {'a':'1', 'b':'2', 'c':'x', 'd':'4'})
+        self.assertEqual([x.pos for x in e.children], [0, 1, 2, 3])
+        self.assertEqual(e.asdict(),
+                         {'mapping.a':'a', 'mapping.b':'b',
+                          'mapping.c':'"x" is not a number',
+                          'mapping.d':'d'})
+
+    def test_deserialize_override(self):
+        import colander
+        class Upper(colander.SchemaNode):
+            def deserialize(self, cstruct=colander.null):
+                return colander.SchemaNode.deserialize(self, cstruct).upper()
+        executor = DummyExecutor()
+        node = self._makeNode(executor, [])
+        node.add(Upper(colander.String(), name='a',
+                       validator=self._makeValidator()))
+        self.assertEqual(node.deserialize({'a':'ab'}), {'a':u'AB'})
+        self.assertEqual(executor.submitted, [])
+
+    def test_unknown_raise_after_wait(self):
+        executor = DummyExecutor()
+        node = self._makeNode(executor, [('a', self._makeValidator())],
+                              unknown='raise')
+        e = invalid_exc(node.deserialize, {'a':'1', 'z':'2'})
+        self.failUnless('Unrecognized keys' in e.msg.interpolate())
+        self.assertEqual(executor.futures[0].waited, True)
+
+    def test_threads(self):
+        import threading
+        event = threading.Event()
+        class Waiting(object):
+            cost = 1
+            def __call__(self, node, value):
+                # only succeeds if the other validator runs concurrently
+                event.wait(5)
+                if not event.isSet():
+                    raise AssertionError('not concurrent')
+        class Setting(object):
+            cost = 1
+            def __call__(self, node, value):
+                event.set()
+        node = self._makeNode(ThreadExecutor(),
+                              [('a', Waiting()), ('b', Setting())])
+        self.assertEqual(node.deserialize({'a':'1', 'b':'2'}),
+                         {'a':1, 'b':2})
+
+class TestRecord(unittest.TestCase):
+    def _makeOne(self, **kw):
+        from colander import record_type
+        return record_type(['a', 'b'])(**kw)
+
+    def test_record_type_cached(self):
+        from colander import record_type
+        self.failUnless(record_type(['a', 'b']) is record_type(('a', 'b')))
+        self.failIf(record_type(['a', 'b']) is record_type(['b', 'a']))
+
+    def test_invalid_names(self):
+        from colander import record_type
+        self.assertRaises(ValueError, record_type, ['first-name'])
+        self.assertRaises(ValueError, record_type, ['a', 'keys'])
+        self.assertRaises(ValueError, record_type, ['__init__'])
+
+    def test_no_dict(self):
+        record = self._makeOne(a=1, b=2)
+        self.failIf(hasattr(record, '__dict__'))
+        self.assertRaises(AttributeError, self._makeOne, c=1)
+
+    def test_mapping_protocol(self):
+        record = self._makeOne(a=1, b=2)
+        self.assertEqual(record.keys(), ['a', 'b'])
+        self.assertEqual(list(record), ['a', 'b'])
+        self.assertEqual(record['a'], 1)
+        self.assertEqual(record.get('b'), 2)
+        self.assertEqual(record.get('c', 3), 3)
+        self.assertRaises(KeyError, record.__getitem__, 'c')
+        record['a'] = 5
+        self.assertEqual(record.a, 5)
+        self.assertRaises(KeyError, record.__setitem__, 'c', 1)
+        self.assertEqual(dict(record), {'a':5, 'b':2})
+
+    def test_eq(self):
+        record = self._makeOne(a=1, b=2)
+        self.assertEqual(record, self._makeOne(a=1, b=2))
+        self.assertNotEqual(record, self._makeOne(a=1, b=3))
+        self.assertNotEqual(record, {'a':1, 'b':2})
+
+    def test_repr(self):
+        from colander import null
+        record = self._makeOne(a=1)
+        self.assertEqual(repr(record), 'Record(a=1, b=%r)' % null)
+
+class TestLazyMapping(unittest.TestCase):
+    def _makeNode(self, unknown='ignore', validator=None):
+        import colander
+        return colander.SchemaNode(
+            colander.Mapping(unknown=unknown, lazy=True),
+            colander.SchemaNode(colander.Int(), name='a'),
+            colander.SchemaNode(colander.Int(), name='b',
+                                validator=colander.Range(0, 10)),
+            colander.SchemaNode(colander.Int(), name='c', missing=3),
+            validator=validator)
+
+    def test_deserialize_returns_lazy(self):
+        from colander import LazyMapping
+        node = self._makeNode()
+        result = node.deserialize({'a':'1', 'b':'x'})
+        self.failUnless(isinstance(result, LazyMapping))
+        self.assertEqual(result.node, node)
+        self.assertEqual(result['a'], 1)
+        self.assertEqual(result['c'], 3)
+
+    def test_deserialize_null(self):
+        from colander import null
+        node = self._makeNode()
+        result = node.typ.deserialize(node, null)
+        self.assertEqual(result, null)
+
+    def test_deserialize_not_a_mapping(self):
+        node = self._makeNode()
+        e = invalid_exc(node.deserialize, 1)
+        self.failUnless(
+            e.msg.interpolate().startswith('"1" is not a mapping type'))
+
+    def test_values_are_memoized(self):
+        node = self._makeNode()
+        calls = []
+        def preparer(value):
+            calls.append(value)
+            return value
+        node['a'].preparer = preparer
+        result = node.deserialize({'a':'1'})
+        self.assertEqual(calls, [])
+        self.assertEqual(result['a'], 1)
+        self.assertEqual(result['a'], 1)
+        self.assertEqual(calls, [1])
+
+    def test_invalid_on_access(self):
+        node = self._makeNode()
+        result = node.deserialize({'a':'1', 'b':'11'})
+        e = invalid_exc(result.__getitem__, 'b')
+        self.assertEqual(e.node, node)
+        self.assertEqual(e.asdict(),
+                         {'b':'11 is greater than maximum value 10'})
+        self.assertEqual(result['a'], 1)
+
+    def test_unknown_key(self):
+        node = self._makeNode()
+        result = node.deserialize({'a':'1', 'z':'1'})
+        self.assertRaises(KeyError, result.__getitem__, 'z')
+        self.assertEqual(result.get('z'), None)
+        self.failIf('z' in result)
+        self.failUnless('b' in result)
+
+    def test_unknown_raise(self):
+        node = self._makeNode(unknown='raise')
+        e = invalid_exc(node.deserialize, {'a':'1', 'z':'1'})
+        self.assertEqual(e.msg.interpolate(),
+                         "Unrecognized keys in mapping: \"{'z': '1'}\"")
+
+    def test_unknown_preserve(self):
+        node = self._makeNode(unknown='preserve')
+        result = node.deserialize({'a':'1', 'z':'1'})
+        self.assertEqual(result.keys(), ['a', 'b', 'c', 'z'])
+        self.assertEqual(result['z'], '1')
+
+    def test_validate_all(self):
+        node = self._makeNode()
+        result = node.deserialize({'a':'1', 'b':'2'})
+        self.failUnless(result.validate_all() is result)
+        self.assertEqual(result, {'a':1, 'b':2, 'c':3})
+
+    def test_validate_all_invalid(self):
+        node = self._makeNode()
+        result = node.deserialize({'b':'20'})
+        e = invalid_exc(result.validate_all)
+        self.assertEqual(e.node, node)
+        self.assertEqual(e.asdict(),
+                         {'a':'Required',
+                          'b':'20 is greater than maximum value 10'})
+        self.assertEqual([x.pos for x in e.children], [0, 1])
+
+    def test_validator_sees_lazy_mapping(self):
+        seen = []
+        def validator(node, value):
+            seen.append(value['a'])
+        node = self._makeNode(validator=validator)
+        result = node.deserialize({'a':'1', 'b':'x'})
+        self.assertEqual(seen, [1])
+        self.failUnless(repr(result).endswith('(1 of 3 values resolved)>'))
+
+    def test_setitem_delitem(self):
+        node = self._makeNode()
+        result = node.deserialize({'a':'1', 'b':'x'})
+        result['b'] = 5
+        result['d'] = 4
+        self.assertEqual(result['b'], 5)
+        self.assertEqual(len(result), 4)
+        del result['a']
+        del result['d']
+        self.assertEqual(list(result), ['b', 'c'])
+        self.assertRaises(KeyError, result.__delitem__, 'a')
+        self.assertEqual(dict(result), {'b':5, 'c':3})
+
 class TestTuple(unittest.TestCase):
     def _makeOne(self):
         from colander import Tuple
@@ -787,6 +1527,72 @@ class TestSequence(unittest.TestCase):
         from colander import Sequence
         self.assertEqual(Seq, Sequence)
 
+    def _makeItemsNode(self):
+        import colander
+        class CountingRange(colander.Range):
+            calls = 0
+            def __call__(self, node, value):
+                CountingRange.calls += 1
+                return colander.Range.__call__(self, node, value)
+            # still vectorized, as the checks of __call__ are the same
+            validate_items = colander.Range.validate_items.im_func
+        child = colander.SchemaNode(colander.Int(), missing=-5,
+                                    validator=CountingRange(0, 10))
+        return colander.SchemaNode(self._makeOne(), child, name='seq')
+
+    def test_deserialize_validate_items(self):
+        node = self._makeItemsNode()
+        result = node.deserialize(['1', '2', '', '3'])
+        self.assertEqual(result, [1, 2, -5, 3])
+        self.assertEqual(node.children[0].validator.calls, 0)
+
+    def test_deserialize_validate_items_fails(self):
+        node = self._makeItemsNode()
+        e = invalid_exc(node.deserialize, ['11', 'x', '1', '-1'])
+        self.assertEqual(e.asdict(),
+                         {'seq.0':'11 is greater than maximum value 10',
+                          'seq.1':'"x" is not a number',
+                          'seq.3':'-1 is less than minimum value 0'})
+        self.assertEqual([x.pos for x in e.children], [0, 1, 3])
+
+    def test_deserialize_validate_items_call_override(self):
+        import colander
+        class EvenRange(colander.Range):
+            def __call__(self, node, value):
+                colander.Range.__call__(self, node, value)
+                if value % 2:
+                    raise colander.Invalid(node, 'odd')
+        child = colander.SchemaNode(colander.Int(),
+                                    validator=EvenRange(0, 10))
+        node = colander.SchemaNode(self._makeOne(), child, name='seq')
+        self.assertEqual(node.deserialize(['2', '4']), [2, 4])
+        e = invalid_exc(node.deserialize, ['1', '2', '3', '11'])
+        self.assertEqual(e.asdict(),
+                         {'seq.0':'odd', 'seq.2':'odd',
+                          'seq.3':'11 is greater than maximum value 10'})
+
+    def test_deserialize_validate_items_both_overridden(self):
+        import colander
+        class Custom(colander.Range):
+            def __call__(self, node, value):
+                raise colander.Invalid(node, 'never')
+            def validate_items(self, node, values):
+                return []
+        child = colander.SchemaNode(colander.Int(), validator=Custom())
+        node = colander.SchemaNode(self._makeOne(), child)
+        self.assertEqual(node.deserialize(['1']), [1])
+
+    def test_deserialize_validate_items_override(self):
+        import colander
+        class Upper(colander.SchemaNode):
+            def deserialize(self, cstruct=colander.null):
+                return colander.SchemaNode.deserialize(self, cstruct).upper()
+        child = Upper(colander.String(), validator=colander.Length(max=5))
+        node = colander.SchemaNode(self._makeOne(), child)
+        self.assertEqual(node.deserialize(['ab', 'cd']), [u'AB', u'CD'])
+        e = invalid_exc(node.deserialize, ['ab', 'abcdef'])
+        self.assertEqual([x.pos for x in e.children], [1])
+
     def test_deserialize_not_iterable(self):
         node = DummySchemaNode(None)
         typ = self._makeOne()
@@ -1033,6 +1839,132 @@ class TestString(unittest.TestCase):
         e = invalid_exc(typ.serialize, node, not_utf8)
         self.failUnless('cannot be serialized' in e.msg)
 
+    def test_serialize_utf8_string_unchanged(self):
+        utf8 = u'\xf8'.encode('utf-8')
+        node = DummySchemaNode(None)
+        typ = self._makeOne('utf-8')
+        result = typ.serialize(node, utf8)
+        self.failUnless(result is utf8)
+
+    def test_serialize_truncated_utf16(self):
+        truncated = u'\xf8'.encode('utf-16') + '\x00'
+        node = DummySchemaNode(None)
+        typ = self._makeOne('utf-16')
+        e = invalid_exc(typ.serialize, node, truncated)
+        self.failUnless('cannot be serialized' in e.msg)
+
+    def test_serialize_buffer_and_memoryview(self):
+        utf8 = u'\xf8'.encode('utf-8')
+        node = DummySchemaNode(None)
+        typ = self._makeOne('utf-8')
+        self.assertEqual(typ.serialize(node, buffer(utf8)), utf8)
+        try:
+            memoryview
+        except NameError: # pragma: no cover
+            return
+        self.assertEqual(typ.serialize(node, memoryview(utf8)), utf8)
+
+    def test_deserialize_buffer_and_memoryview(self):
+        uni = u'\xf8'
+        utf8 = uni.encode('utf-8')
+        node = DummySchemaNode(None)
+        typ = self._makeOne('utf-8')
+        self.assertEqual(typ.deserialize(node, buffer(utf8)), uni)
+        try:
+            memoryview
+        except NameError: # pragma: no cover
+            return
+        self.assertEqual(typ.deserialize(node, memoryview(utf8)), uni)
+
+    def test_deserialize_memoryview_from_None(self):
+        try:
+            memoryview
+        except NameError: # pragma: no cover
+            return
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        self.assertEqual(typ.deserialize(node, memoryview('abc')), u'abc')
+
+    def test_deserialize_nonstring_with_encoding(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne('utf-8')
+        self.assertEqual(typ.deserialize(node, 10), u'10')
+
+    def test_deserialize_invalid_utf8(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne('utf-8')
+        e = invalid_exc(typ.deserialize, node, '\xff\xfe\xf8\x00')
+        self.failUnless(e.msg)
+
+    def test_unknown_encoding(self):
+        self.assertRaises(LookupError, self._makeOne, 'nonesuch')
+
+    def test_subclass_without_base_init(self):
+        from colander import String
+        class MyString(String):
+            def __init__(self):
+                pass
+        node = DummySchemaNode(None)
+        typ = MyString()
+        self.assertEqual(typ.deserialize(node, 'abc'), u'abc')
+        self.assertEqual(typ.serialize(node, u'abc'), u'abc')
+        typ.encoding = 'utf-8'
+        self.assertEqual(typ.deserialize(node, '\xc3\xb8'), u'\xf8')
+        self.assertEqual(typ.serialize(node, u'\xf8'), '\xc3\xb8')
+        typ.intern = True
+        self.assertEqual(typ.deserialize(node, 'abc'), u'abc')
+        self.assertEqual(typ.interned, {u'abc':u'abc'})
+
+    def test_deserialize_intern(self):
+        from colander import String
+        node = DummySchemaNode(None)
+        typ = String('utf-8', intern=True)
+        first = typ.deserialize(node, 'abc')
+        second = typ.deserialize(node, 'abc')
+        self.assertEqual(first, u'abc')
+        self.failUnless(first is second)
+        self.failUnless(typ.deserialize(node, u'abc') is first)
+
+    def test_deserialize_intern_bounded(self):
+        from colander import String
+        node = DummySchemaNode(None)
+        typ = String(intern=True)
+        typ.intern_size = 1
+        typ.deserialize(node, 'abc')
+        first = typ.deserialize(node, 'def')
+        second = typ.deserialize(node, 'def')
+        self.assertEqual(first, second)
+        self.failIf(first is second)
+        self.assertEqual(typ.interned.keys(), [u'abc'])
+
+    def test_deserialize_no_intern(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        first = typ.deserialize(node, 'abc')
+        self.failIf(typ.deserialize(node, 'abc') is first)
+
+    def test_deserialize_intern_oneof(self):
+        from colander import OneOf
+        node = DummySchemaNode(None)
+        node.validator = OneOf(['abc'])
+        typ = self._makeOne()
+        first = typ.deserialize(node, 'abc')
+        self.failUnless(typ.deserialize(node, 'abc') is first)
+
+    def test_deserialize_intern_oneof_rejected(self):
+        from colander import OneOf
+        from colander import String
+        node = DummySchemaNode(None)
+        node.validator = OneOf(['us'])
+        typ = String(intern=True)
+        typ.intern_size = 2
+        for num in range(5):
+            typ.deserialize(node, 'x%s' % num)
+        self.assertEqual(typ.interned, {})
+        first = typ.deserialize(node, 'us')
+        self.failUnless(typ.deserialize(node, 'us') is first)
+        self.assertEqual(typ.interned.keys(), [u'us'])
+
 class TestInteger(unittest.TestCase):
     def _makeOne(self):
         from colander import Integer
@@ -1043,6 +1975,14 @@ class TestInteger(unittest.TestCase):
         from colander import Integer
         self.assertEqual(Int, Integer)
 
+    def test_subclass_without_base_init(self):
+        from colander import Integer
+        class MyInteger(Integer):
+            def __init__(self):
+                pass
+        node = DummySchemaNode(None)
+        self.assertEqual(MyInteger().deserialize(node, 1.5), 1)
+
     def test_serialize_null(self):
         import colander
         val = colander.null
@@ -1087,6 +2027,41 @@ class TestInteger(unittest.TestCase):
         result = typ.serialize(node, val)
         self.assertEqual(result, '1')
 
+    def test_deserialize_int_passthrough(self):
+        val = 10L
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        result = typ.deserialize(node, val)
+        self.failUnless(result is val)
+
+    def test_deserialize_padded_string(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        self.assertEqual(typ.deserialize(node, ' -12 '), -12)
+        self.assertEqual(typ.deserialize(node, u'+3'), 3)
+
+    def test_deserialize_float_not_strict(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        self.assertEqual(typ.deserialize(node, 1.5), 1)
+        self.assertEqual(typ.deserialize(node, True), 1)
+
+    def test_deserialize_strict_ok(self):
+        from colander import Integer
+        node = DummySchemaNode(None)
+        typ = Integer(strict=True)
+        self.assertEqual(typ.deserialize(node, 0), 0)
+        self.assertEqual(typ.deserialize(node, '42'), 42)
+
+    def test_deserialize_strict_fails(self):
+        from colander import Integer
+        node = DummySchemaNode(None)
+        typ = Integer(strict=True)
+        for val in (True, False, 1.0, '1.0', 'P'):
+            e = invalid_exc(typ.deserialize, node, val)
+            self.assertEqual(e.msg.interpolate(),
+                             '"%s" is not an integer' % val)
+
 class TestFloat(unittest.TestCase):
     def _makeOne(self):
         from colander import Float
@@ -1136,11 +2111,28 @@ class TestFloat(unittest.TestCase):
         result = typ.serialize(node, val)
         self.assertEqual(result, '1.0')
 
+    def test_deserialize_float_passthrough(self):
+        val = 1.5
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        result = typ.deserialize(node, val)
+        self.failUnless(result is val)
+
 class TestDecimal(unittest.TestCase):
     def _makeOne(self):
         from colander import Decimal
         return Decimal()
 
+    def test_subclass_without_base_init(self):
+        import decimal
+        from colander import Decimal
+        class MyDecimal(Decimal):
+            def __init__(self):
+                pass
+        node = DummySchemaNode(None)
+        self.assertEqual(MyDecimal().deserialize(node, '1.5'),
+                         decimal.Decimal('1.5'))
+
     def test_serialize_null(self):
         import colander
         val = colander.null
@@ -1186,6 +2178,206 @@ class TestDecimal(unittest.TestCase):
         result = typ.serialize(node, val)
         self.assertEqual(result, '1.0')
 
+    def test_deserialize_decimal_passthrough(self):
+        import decimal
+        val = decimal.Decimal('1.5')
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        result = typ.deserialize(node, val)
+        self.failUnless(result is val)
+
+    def test_deserialize_unicode_and_int(self):
+        import decimal
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        self.assertEqual(typ.deserialize(node, u'1.50'),
+                         decimal.Decimal('1.50'))
+        self.assertEqual(typ.deserialize(node, 10L), decimal.Decimal('10'))
+
+    def test_deserialize_float(self):
+        import decimal
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        self.assertEqual(typ.deserialize(node, 1.1), decimal.Decimal('1.1'))
+
+    def test_deserialize_bool_fails(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        e = invalid_exc(typ.deserialize, node, True)
+        self.failUnless(e.msg)
+
+    def test_deserialize_quant(self):
+        import decimal
+        from colander import Decimal
+        node = DummySchemaNode(None)
+        typ = Decimal('0.01')
+        result = typ.deserialize(node, '1.005')
+        self.assertEqual(str(result), '1.00')
+        result = typ.deserialize(node, decimal.Decimal('2'))
+        self.assertEqual(str(result), '2.00')
+
+    def test_deserialize_quant_rounding(self):
+        import decimal
+        from colander import Decimal
+        node = DummySchemaNode(None)
+        typ = Decimal('0.01', rounding=decimal.ROUND_HALF_UP)
+        self.assertEqual(str(typ.deserialize(node, '1.005')), '1.01')
+        self.assertEqual(str(typ.deserialize(node, 1.5)), '1.50')
+
+    def test_deserialize_quant_context(self):
+        import decimal
+        from colander import Decimal
+        node = DummySchemaNode(None)
+        context = decimal.Context(prec=3, rounding=decimal.ROUND_UP)
+        typ = Decimal('0.1', context=context)
+        self.assertEqual(str(typ.deserialize(node, '1.01')), '1.1')
+        e = invalid_exc(typ.deserialize, node, '1234')
+        self.assertEqual(e.msg.interpolate(), '"1234" is not a number')
+
+    def test_serialize_quant(self):
+        import decimal
+        from colander import Decimal
+        node = DummySchemaNode(None)
+        typ = Decimal('0.01', rounding=decimal.ROUND_HALF_UP)
+        self.assertEqual(typ.serialize(node, decimal.Decimal('3.141')),
+                         '3.14')
+        self.assertEqual(typ.serialize(node, 3), '3.00')
+
+class TestIntArray(unittest.TestCase):
+    def _makeOne(self, *arg, **kw):
+        from colander import IntArray
+        return IntArray(*arg, **kw)
+
+    def test_deserialize_null(self):
+        from colander import null
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        self.assertEqual(typ.deserialize(node, null), null)
+
+    def test_deserialize_not_iterable(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        e = invalid_exc(typ.deserialize, node, 1)
+        self.assertEqual(e.msg.interpolate(), '"1" is not iterable')
+        e = invalid_exc(typ.deserialize, node, {})
+        self.assertEqual(e.msg.interpolate(), '"{}" is not iterable')
+
+    def test_deserialize_numbers(self):
+        import array
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        result = typ.deserialize(node, [1, 2, 3])
+        self.assertEqual(result, array.array('l', [1, 2, 3]))
+
+    def test_deserialize_strings(self):
+        import array
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        result = typ.deserialize(node, ('1', 2, '3'))
+        self.assertEqual(result, array.array('l', [1, 2, 3]))
+
+    def test_deserialize_generator(self):
+        import array
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        result = typ.deserialize(node, (x for x in [1, '2']))
+        self.assertEqual(result, array.array('l', [1, 2]))
+
+    def test_deserialize_fails(self):
+        import colander
+        node = colander.SchemaNode(self._makeOne(), name='samples')
+        e = invalid_exc(node.deserialize, ['1', 'a', 3, 'b'])
+        self.assertEqual(e.asdict(), {'samples.1':'"a" is not a number',
+                                      'samples.3':'"b" is not a number'})
+
+    def test_deserialize_range(self):
+        import array
+        node = DummySchemaNode(None)
+        typ = self._makeOne(min=0, max=10)
+        result = typ.deserialize(node, [0, 10])
+        self.assertEqual(result, array.array('l', [0, 10]))
+        self.assertEqual(typ.deserialize(node, []), array.array('l'))
+
+    def test_deserialize_range_fails(self):
+        import colander
+        node = colander.SchemaNode(self._makeOne(min=0, max=10),
+                                   name='samples')
+        e = invalid_exc(node.deserialize, [5, -1, 11, 3])
+        self.assertEqual(e.asdict(),
+                         {'samples.1':'-1 is less than minimum value 0',
+                          'samples.2':'11 is greater than maximum value 10'})
+        self.assertEqual([x.pos for x in e.children], [1, 2])
+
+    def test_deserialize_all_failures(self):
+        import colander
+        node = colander.SchemaNode(self._makeOne(max=10), name='samples')
+        e = invalid_exc(node.deserialize, ['x', 20, '5', 2 ** 70, 30])
+        self.assertEqual(e.asdict(),
+                         {'samples.0':'"x" is not a number',
+                          'samples.1':'20 is greater than maximum value 10',
+                          'samples.3':'"%s" is out of range' % (2 ** 70),
+                          'samples.4':'30 is greater than maximum value 10'})
+        self.assertEqual([x.pos for x in e.children], [0, 1, 3, 4])
+
+    def test_deserialize_numpy(self):
+        try:
+            import numpy
+        except ImportError: # pragma: no cover
+            return
+        node = DummySchemaNode(None)
+        typ = self._makeOne(numpy=True)
+        result = typ.deserialize(node, ['1', 2])
+        self.failUnless(isinstance(result, numpy.ndarray))
+        self.assertEqual(list(result), [1, 2])
+
+    def test_deserialize_numpy_range_fails(self):
+        try:
+            import numpy
+        except ImportError: # pragma: no cover
+            return
+        import colander
+        node = colander.SchemaNode(self._makeOne(min=0, numpy=True),
+                                   name='samples')
+        e = invalid_exc(node.deserialize, [1, -1])
+        self.assertEqual(e.asdict(),
+                         {'samples.1':'-1 is less than minimum value 0'})
+
+    def test_serialize_null(self):
+        from colander import null
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        self.assertEqual(typ.serialize(node, null), null)
+
+    def test_serialize_ok(self):
+        import array
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        result = typ.serialize(node, array.array('l', [1, 2]))
+        self.assertEqual(result, ['1', '2'])
+
+    def test_serialize_fails(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        e = invalid_exc(typ.serialize, node, ['a'])
+        self.failUnless(e.msg)
+
+class TestFloatArray(unittest.TestCase):
+    def _makeOne(self, *arg, **kw):
+        from colander import FloatArray
+        return FloatArray(*arg, **kw)
+
+    def test_deserialize(self):
+        import array
+        node = DummySchemaNode(None)
+        typ = self._makeOne(max=2.0)
+        result = typ.deserialize(node, [1, '1.5', 2.0])
+        self.assertEqual(result, array.array('d', [1.0, 1.5, 2.0]))
+
+    def test_serialize(self):
+        node = DummySchemaNode(None)
+        typ = self._makeOne()
+        self.assertEqual(typ.serialize(node, [1.5]), ['1.5'])
+
 class TestBoolean(unittest.TestCase):
     def _makeOne(self):
         from colander import Boolean
@@ -1234,6 +2426,114 @@ class TestBoolean(unittest.TestCase):
         self.assertEqual(typ.serialize(node, None), 'false')
         self.assertEqual(typ.serialize(node, False), 'false')
 
+    def test_deserialize_bool(self):
+        typ = self._makeOne()
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.deserialize(node, True), True)
+        self.assertEqual(typ.deserialize(node, False), False)
+        self.assertEqual(typ.deserialize(node, 0), False)
+        self.assertEqual(typ.deserialize(node, u'False'), False)
+
+    def test_deserialize_choices(self):
+        from colander import Boolean
+        typ = Boolean(false_choices=('no', 'Off'), true_choices=('yes',))
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.deserialize(node, 'no'), False)
+        self.assertEqual(typ.deserialize(node, 'OFF'), False)
+        self.assertEqual(typ.deserialize(node, 'yes'), True)
+        self.assertEqual(typ.deserialize(node, 'false'), True)
+
+    def test_deserialize_strict(self):
+        from colander import Boolean
+        typ = Boolean(strict=True)
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.deserialize(node, 'TRUE'), True)
+        self.assertEqual(typ.deserialize(node, 1), True)
+        self.assertEqual(typ.deserialize(node, '0'), False)
+        e = invalid_exc(typ.deserialize, node, 'other')
+        self.assertEqual(e.msg.interpolate(),
+                         '"other" is neither in (false, 0) '
+                         'nor in (true, 1)')
+
+    def test_serialize_choices_roundtrip(self):
+        from colander import Boolean
+        typ = Boolean(false_choices=('no', 'off'), true_choices=('yes',),
+                      strict=True)
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.serialize(node, True), 'yes')
+        self.assertEqual(typ.serialize(node, False), 'no')
+        for value in (True, False):
+            self.assertEqual(
+                typ.deserialize(node, typ.serialize(node, value)), value)
+
+    def test_subclass_without_base_init(self):
+        from colander import Boolean
+        class MyBoolean(Boolean):
+            def __init__(self):
+                pass
+        typ = MyBoolean()
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.deserialize(node, 'false'), False)
+        self.assertEqual(typ.deserialize(node, 'other'), True)
+        self.assertEqual(typ.serialize(node, False), 'false')
+
+class TestEnum(unittest.TestCase):
+    def _makeOne(self, choices):
+        from colander import Enum
+        return Enum(choices)
+
+    def test_deserialize(self):
+        typ = self._makeOne([('us', 1), ('fr', 2)])
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.deserialize(node, 'us'), 1)
+        self.assertEqual(typ.deserialize(node, u'fr'), 2)
+
+    def test_deserialize_dict(self):
+        typ = self._makeOne({'us':1})
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.deserialize(node, 'us'), 1)
+
+    def test_deserialize_null(self):
+        from colander import null
+        typ = self._makeOne([('us', 1)])
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.deserialize(node, null), null)
+        self.assertEqual(typ.deserialize(node, ''), null)
+
+    def test_deserialize_emptystring_choice(self):
+        typ = self._makeOne([('', 0)])
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.deserialize(node, ''), 0)
+
+    def test_deserialize_fails(self):
+        typ = self._makeOne([('us', 1), ('fr', 2)])
+        node = DummySchemaNode(None)
+        e = invalid_exc(typ.deserialize, node, 'de')
+        self.assertEqual(e.msg.interpolate(), '"de" is not one of us, fr')
+        e = invalid_exc(typ.deserialize, node, ['us'])
+        self.assertEqual(e.msg.interpolate(),
+                         '"[\'us\']" is not one of us, fr')
+
+    def test_serialize(self):
+        typ = self._makeOne([('us', 1), ('fr', 2)])
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.serialize(node, 2), 'fr')
+
+    def test_serialize_null(self):
+        from colander import null
+        typ = self._makeOne([('us', 1)])
+        node = DummySchemaNode(None)
+        self.assertEqual(typ.serialize(node, null), null)
+
+    def test_serialize_fails(self):
+        typ = self._makeOne([('us', 1)])
+        node = DummySchemaNode(None)
+        e = invalid_exc(typ.serialize, node, 3)
+        self.assertEqual(e.msg.interpolate(), '"3" is not one of the choices')
+        e = invalid_exc(typ.serialize, node, [1])
+        self.assertEqual(e.msg.interpolate(),
+                         '"[1]" is not one of the choices')
+
 class TestGlobalObject(unittest.TestCase):
     def _makeOne(self, package=None):
         from colander import GlobalObject
@@ -2025,6 +3325,850 @@ class TestSchemaNode(unittest.TestCase):
         self.assertEqual(len(outer_clone.children), 0)
         self.assertEqual(len(outer_node.children), 1)
 
+    def _makeProjectable(self, validator=None):
+        import colander
+        meta = self._makeOne(
+            colander.Mapping(),
+            self._makeOne(colander.Int(), name='created'),
+            self._makeOne(colander.Int(), name='modified',
+                          validator=colander.Range(0, 10)),
+            name='meta')
+        phone = self._makeOne(
+            colander.Mapping(),
+            self._makeOne(colander.String(), name='location'),
+            self._makeOne(colander.String(), name='number'),
+            name='phone')
+        phones = self._makeOne(colander.Sequence(), phone, name='phones')
+        return self._makeOne(
+            colander.Mapping(unknown='raise'),
+            self._makeOne(colander.Int(), name='id'),
+            self._makeOne(colander.String(), name='title',
+                          validator=colander.Length(max=2)),
+            meta,
+            phones,
+            validator=validator)
+
+    def test_deserialize_only(self):
+        node = self._makeProjectable(validator=DummyValidator('wrong'))
+        cstruct = {'id':'1', 'title':'too long', 'meta':{'created':'2',
+                                                         'modified':'99'}}
+        result = node.deserialize(cstruct, only=['id', 'meta.created'])
+        self.assertEqual(result, {'id':1, 'meta':{'created':2}})
+
+    def test_deserialize_only_required_checks(self):
+        node = self._makeProjectable()
+        e = invalid_exc(node.deserialize, {'title':'ab'}, only=['id'])
+        self.assertEqual(e.asdict(), {'id':'Required'})
+
+    def test_deserialize_exclude(self):
+        node = self._makeProjectable()
+        cstruct = {'id':'1', 'title':'too long',
+                   'meta':{'created':'2', 'modified':'99'},
+                   'phones':[]}
+        result = node.deserialize(cstruct, exclude=['title', 'meta.modified'])
+        self.assertEqual(result, {'id':1, 'meta':{'created':2}, 'phones':[]})
+
+    def test_deserialize_only_through_sequence(self):
+        node = self._makeProjectable()
+        cstruct = {'phones':[{'location':'home', 'number':'555'}]}
+        result = node.deserialize(cstruct, only=['phones.number'])
+        self.assertEqual(result, {'phones':[{'number':u'555'}]})
+
+    def test_serialize_only(self):
+        node = self._makeProjectable()
+        appstruct = {'id':1, 'title':'title', 'meta':{'created':2,
+                                                      'modified':3}}
+        result = node.serialize(appstruct, only=['id', 'meta.created'])
+        self.assertEqual(result, {'id':'1', 'meta':{'created':'2'}})
+        self.assertEqual(appstruct['meta'], {'created':2, 'modified':3})
+
+    def test_serialize_only_missing_values(self):
+        from colander import null
+        node = self._makeProjectable()
+        result = node.serialize({'title':'title'}, only=['id', 'meta'])
+        self.assertEqual(result, {'id':null,
+                                  'meta':{'created':null, 'modified':null}})
+
+    def test_serialize_exclude(self):
+        node = self._makeProjectable()
+        appstruct = {'id':1, 'title':'title',
+                     'meta':{'created':2, 'modified':3},
+                     'phones':[{'location':'home', 'number':'555'}]}
+        result = node.serialize(
+            appstruct, exclude=['title', 'meta', 'phones.location'])
+        self.assertEqual(result, {'id':'1', 'phones':[{'number':u'555'}]})
+
+    def test_serialize_sparse(self):
+        node = self._makeProjectable()
+        appstruct = {'id':1, 'meta':{'modified':3}, 'phones':[{'number':'1'}]}
+        result = node.serialize(appstruct, sparse=True)
+        self.assertEqual(result, {'id':'1', 'meta':{'modified':'3'},
+                                  'phones':[{'number':u'1'}]})
+        self.failIf(node['meta'].typ.sparse)
+        self.failUnless(node._derive(None, None, True) is
+                        node._derive(None, None, True))
+
+    def test_serialize_sparse_nested_null(self):
+        node = self._makeProjectable()
+        result = node.serialize({'id':1}, sparse=True)
+        self.assertEqual(result, {'id':'1'})
+
+    def test_serialize_sparse_through_tuple(self):
+        import colander
+        inner = self._makeOne(
+            colander.Mapping(),
+            self._makeOne(colander.Int(), name='a'),
+            self._makeOne(colander.Int(), name='b'),
+            name='inner')
+        node = self._makeOne(
+            colander.Tuple(),
+            self._makeOne(colander.Int(), name='x'),
+            inner)
+        result = node.serialize((1, {'a':2}), sparse=True)
+        self.assertEqual(result, ('1', {'a':'2'}))
+
+    def test_serialize_sparse_with_only(self):
+        node = self._makeProjectable()
+        result = node.serialize({'id':1, 'title':'abc', 'meta':{}},
+                                only=['title', 'meta'], sparse=True)
+        self.assertEqual(result, {'title':u'abc', 'meta':{}})
+
+    def test_project_unknown_name(self):
+        node = self._makeProjectable()
+        self.assertRaises(KeyError, node.project, ['nope'])
+        self.assertRaises(KeyError, node.project, None, ['meta.nope'])
+        self.assertRaises(KeyError, node.project, ['id.nope'])
+
+    def test_project_single_string(self):
+        node = self._makeProjectable()
+        self.assertRaises(TypeError, node.project, 'id')
+        self.assertRaises(TypeError, node.project, None, 'meta')
+        self.assertRaises(TypeError, node.deserialize, {'id':'1'}, 'id')
+
+    def test_project_leaves_original_alone(self):
+        node = self._makeProjectable(validator=DummyValidator('wrong'))
+        projected = node.project(['meta.created'])
+        self.assertEqual(projected.typ.unknown, 'ignore')
+        self.assertEqual(projected.validator, None)
+        self.assertEqual([x.name for x in projected['meta']], ['created'])
+        self.assertEqual(node.typ.unknown, 'raise')
+        self.assertEqual(node.validator.msg, 'wrong')
+        self.assertEqual(len(node['meta'].children), 2)
+
+    def test_project_shares_untouched_subtrees(self):
+        node = self._makeProjectable()
+        projected = node.project(['id', 'meta'])
+        self.failUnless(projected['meta'] is node['meta'])
+
+    def test_project_cached(self):
+        node = self._makeProjectable()
+        projected = node.project(['id', 'meta.created'])
+        self.failUnless(node.project(('meta.created', 'id')) is projected)
+        self.failIf(node.project(['id']) is projected)
+
+    def test_project_cache_cleared(self):
+        import colander
+        node = self._makeProjectable()
+        projected = node.project(exclude=['id'])
+        node.add(self._makeOne(colander.Int(), name='extra'))
+        self.failIf(node.project(exclude=['id']) is projected)
+        projected = node.project(exclude=['id'])
+        del node['extra']
+        self.failIf(node.project(exclude=['id']) is projected)
+        projected = node.project(exclude=['id'])
+        node['title'] = self._makeOne(colander.Int())
+        self.failIf(node.project(exclude=['id']) is projected)
+        projected = node.project(exclude=['id'])
+        self.failIf(node.clone().project(exclude=['id']) is projected)
+
+    def test_project_cache_bounded(self):
+        node = self._makeProjectable()
+        node._cache_size = 1
+        node.project(['id'])
+        node.project(['title'])
+        self.assertEqual(len(node._cache), 1)
+
+class TestSchemaNodeDeadline(unittest.TestCase):
+    def setUp(self):
+        import colander
+        self.time = colander.time
+
+    def tearDown(self):
+        import colander
+        colander.time = self.time
+
+    def _setClock(self, times):
+        import colander
+        class Clock(object):
+            def time(self):
+                return times.pop(0)
+        colander.time = Clock()
+
+    def _makeSchema(self, subvalidator=None):
+        import colander
+        return colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.Int(), name='a'),
+            colander.SchemaNode(
+                colander.Sequence(),
+                colander.SchemaNode(colander.Int(), validator=subvalidator),
+                name='seq'),
+            colander.SchemaNode(
+                colander.Tuple(),
+                colander.SchemaNode(colander.Int(), name='x'),
+                name='tup'),
+            name='root')
+
+    def test_deadline_passed(self):
+        import time
+        from colander import DeadlineExceeded
+        schema = self._makeSchema()
+        e = invalid_exc(schema.deserialize, {}, deadline=time.time() - 1)
+        self.failUnless(isinstance(e, DeadlineExceeded))
+        self.failUnless(e.node is schema)
+        self.assertEqual(e.msg.interpolate(), 'Deadline exceeded')
+
+    def test_budget_ok(self):
+        from colander import _run_state
+        schema = self._makeSchema()
+        result = schema.deserialize({'a':'1', 'seq':['2'], 'tup':['3']},
+                                    budget=60)
+        self.assertEqual(result, {'a':1, 'seq':[2], 'tup':(3,)})
+        self.assertEqual(_run_state.deadline, None)
+
+    def test_earliest_of_deadline_and_budget(self):
+        import time
+        from colander import DeadlineExceeded
+        from colander import _run_state
+        schema = self._makeSchema()
+        self.assertRaises(DeadlineExceeded, schema.deserialize, {},
+                          deadline=time.time() - 1, budget=60)
+        self.assertEqual(_run_state.deadline, None)
+
+    def test_nested_deadline_not_extended(self):
+        import time
+        import colander
+        seen = []
+        def preparer(value):
+            seen.append(colander._deadline())
+            return value
+        schema = colander.SchemaNode(colander.Int(), preparer=preparer)
+        def outer(value):
+            schema.deserialize('1', budget=3600)
+            return value
+        deadline = time.time() + 60
+        colander.SchemaNode(colander.Int(), preparer=outer).deserialize(
+            '1', deadline=deadline)
+        self.assertEqual(seen, [deadline])
+
+    def test_sequence_aborts_without_collecting(self):
+        from colander import DeadlineExceeded
+        schema = self._makeSchema()
+        # budget start, a, seq, item 0, item 1
+        self._setClock([0, 1, 2, 3, 100])
+        e = invalid_exc(schema.deserialize,
+                        {'a':'x', 'seq':['1', '2'], 'tup':['3']}, budget=50)
+        self.failUnless(isinstance(e, DeadlineExceeded))
+        self.failUnless(e.node is schema['seq'])
+        self.assertEqual(e.children, [])
+
+    def test_sequence_validate_items_aborts(self):
+        import colander
+        schema = self._makeSchema(colander.Range(0, 10))
+        self._setClock([0, 1, 2, 3, 100])
+        e = invalid_exc(schema.deserialize,
+                        {'a':'1', 'seq':['1', '2'], 'tup':['3']}, budget=50)
+        self.failUnless(isinstance(e, colander.DeadlineExceeded))
+        self.failUnless(e.node is schema['seq'])
+
+    def test_tuple_aborts(self):
+        from colander import DeadlineExceeded
+        schema = self._makeSchema()
+        # budget start, a, seq, item 0, tup, x
+        self._setClock([0, 1, 2, 3, 4, 100])
+        e = invalid_exc(schema.deserialize,
+                        {'a':'1', 'seq':['1'], 'tup':['3']}, budget=50)
+        self.failUnless(isinstance(e, DeadlineExceeded))
+        self.failUnless(e.node is schema['tup'])
+
+class TestSchemaNodeLimits(unittest.TestCase):
+    def _makeSchema(self, **kw):
+        import colander
+        return colander.SchemaNode(
+            colander.Mapping(max_keys=kw.get('max_keys')),
+            colander.SchemaNode(colander.String(
+                max_length=kw.get('max_length')), name='s'),
+            colander.SchemaNode(
+                colander.Sequence(max_items=kw.get('max_items')),
+                colander.SchemaNode(colander.Int()),
+                name='seq'),
+            name='root')
+
+    def test_no_limits(self):
+        schema = self._makeSchema()
+        result = schema.deserialize({'s':'abc', 'seq':['1', '2']})
+        self.assertEqual(result, {'s':u'abc', 'seq':[1, 2]})
+
+    def test_max_length(self):
+        from colander import LimitExceeded
+        schema = self._makeSchema(max_length=3)
+        self.assertEqual(schema.deserialize({'s':'abc', 'seq':[]}),
+                         {'s':u'abc', 'seq':[]})
+        e = invalid_exc(schema.deserialize, {'s':'abcd', 'seq':[]})
+        self.failUnless(isinstance(e, LimitExceeded))
+        self.failUnless(e.node is schema.children[0])
+        self.assertEqual(e.msg.interpolate(),
+                         'String too long (maximum 3 characters)')
+
+    def test_max_items(self):
+        from colander import LimitExceeded
+        schema = self._makeSchema(max_items=2)
+        e = invalid_exc(schema.deserialize, {'s':'', 'seq':['1', '2', '3']})
+        self.failUnless(isinstance(e, LimitExceeded))
+        self.failUnless(e.node is schema.children[1])
+        self.assertEqual(e.msg.interpolate(), 'Too many items (maximum 2)')
+
+    def test_max_items_iterator_not_consumed(self):
+        from colander import LimitExceeded
+        schema = self._makeSchema(max_items=2)
+        consumed = []
+        def gen():
+            for i in range(100):
+                consumed.append(i)
+                yield str(i)
+        e = invalid_exc(schema.deserialize, {'s':'', 'seq':gen()})
+        self.failUnless(isinstance(e, LimitExceeded))
+        self.assertEqual(consumed, [0, 1, 2])
+
+    def test_max_items_not_copied(self):
+        from colander import LimitExceeded
+        schema = self._makeSchema(max_items=2)
+        class Sized(object):
+            def __len__(self):
+                return 5
+            def __iter__(self):
+                raise AssertionError('copied')
+        e = invalid_exc(schema.deserialize, {'s':'a', 'seq':Sized()})
+        self.failUnless(isinstance(e, LimitExceeded))
+
+    def test_max_items_iterator_within_limit(self):
+        schema = self._makeSchema(max_items=2)
+        result = schema.deserialize({'s':'a', 'seq':iter(['1', '2'])})
+        self.assertEqual(result['seq'], [1, 2])
+
+    def test_max_keys(self):
+        from colander import LimitExceeded
+        schema = self._makeSchema(max_keys=2)
+        e = invalid_exc(schema.deserialize, {'s':'', 'seq':[], 'x':1})
+        self.failUnless(isinstance(e, LimitExceeded))
+        self.failUnless(e.node is schema)
+        self.assertEqual(e.msg.interpolate(), 'Too many keys (maximum 2)')
+
+    def test_limit_not_collected(self):
+        import colander
+        schema = self._makeSchema(max_length=1)
+        # the error of 'seq' would be collected, the limit aborts
+        e = invalid_exc(schema.deserialize, {'s':'ab', 'seq':['x']})
+        self.failUnless(isinstance(e, colander.LimitExceeded))
+        self.failUnless(isinstance(e, colander.Aborted))
+
+    def test_global_defaults(self):
+        from colander import Limits
+        from colander import LimitExceeded
+        schema = self._makeSchema()
+        limits = Limits(max_items=1, max_keys=2, max_length=2)
+        result = schema.deserialize({'s':'ab', 'seq':['1']}, limits=limits)
+        self.assertEqual(result, {'s':u'ab', 'seq':[1]})
+        for cstruct in ({'s':'abc', 'seq':[]},
+                        {'s':'', 'seq':['1', '2']},
+                        {'s':'', 'seq':[], 'x':1}):
+            e = invalid_exc(schema.deserialize, cstruct, limits=limits)
+            self.failUnless(isinstance(e, LimitExceeded))
+
+    def test_own_limit_overrides_global(self):
+        from colander import Limits
+        schema = self._makeSchema(max_length=5)
+        result = schema.deserialize({'s':'abcde', 'seq':[]},
+                                    limits=Limits(max_length=1))
+        self.assertEqual(result['s'], u'abcde')
+
+    def test_max_nodes(self):
+        from colander import Limits
+        from colander import LimitExceeded
+        schema = self._makeSchema()
+        cstruct = {'s':'a', 'seq':['1', '2']}
+        self.assertEqual(schema.deserialize(cstruct, limits=Limits(4)),
+                         {'s':u'a', 'seq':[1, 2]})
+        e = invalid_exc(schema.deserialize, cstruct, limits=Limits(3))
+        self.failUnless(isinstance(e, LimitExceeded))
+        self.assertEqual(e.msg.interpolate(), 'Too many nodes (maximum 3)')
+
+    def test_max_depth(self):
+        import colander
+        seq = colander.SchemaNode(
+            colander.Sequence(),
+            colander.SchemaNode(colander.Sequence(),
+                                colander.SchemaNode(colander.Int())))
+        cstruct = [['1'], ['2']]
+        limits = colander.Limits(max_depth=2)
+        self.assertEqual(seq.deserialize(cstruct, limits=limits), [[1], [2]])
+        e = invalid_exc(seq.deserialize, cstruct,
+                        limits=colander.Limits(max_depth=1))
+        self.failUnless(isinstance(e, colander.LimitExceeded))
+        self.failUnless(e.node is seq.children[0])
+        self.assertEqual(e.msg.interpolate(),
+                         'Too deeply nested (maximum depth 1)')
+
+    def test_state_reset(self):
+        import colander
+        schema = self._makeSchema()
+        cstruct = {'s':'abc', 'seq':['1', '2']}
+        invalid_exc(schema.deserialize, cstruct,
+                    limits=colander.Limits(max_length=1))
+        self.assertEqual(colander._run_state.limits, None)
+        self.assertEqual(schema.deserialize(cstruct)['s'], u'abc')
+        # the node count starts again for each deserialization
+        limits = colander.Limits(max_nodes=4)
+        schema.deserialize(cstruct, limits=limits)
+        schema.deserialize(cstruct, limits=limits)
+
+    def test_nested_limits_ignored(self):
+        import colander
+        outer = colander.Limits(max_length=5)
+        inner = colander.Limits(max_length=1)
+        class Nested(colander.SchemaType):
+            def deserialize(self, node, cstruct):
+                return colander.SchemaNode(colander.String()).deserialize(
+                    cstruct, limits=inner)
+        node = colander.SchemaNode(Nested())
+        self.assertEqual(node.deserialize('abc', limits=outer), u'abc')
+
+class TestSchemaNodeIterative(unittest.TestCase):
+    def _assertSame(self, schema, cstruct, **kw):
+        # deserialize recursively and iteratively, expecting the same
+        # outcome; return the result or the error
+        import colander
+        try:
+            expected = schema.deserialize(cstruct, **kw)
+        except colander.Invalid, e:
+            e2 = invalid_exc(schema.deserialize, cstruct, iterative=True,
+                             **kw)
+            self.assertEqual(e2.__class__, e.__class__)
+            self.failUnless(e2.node is e.node)
+            self.assertEqual(e2.asdict(), e.asdict())
+            return e2
+        result = schema.deserialize(cstruct, iterative=True, **kw)
+        self.assertEqual(result, expected)
+        return result
+
+    def _makeThread(self):
+        import colander
+        comment = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.String(), name='text'),
+            name='comment')
+        comment.add(colander.SchemaNode(colander.Sequence(), comment,
+                                        name='replies', missing=[]))
+        return comment
+
+    def _makeCstruct(self, depth, text='x'):
+        cstruct = leaf = {'text':'0'}
+        for num in range(1, depth):
+            sub = {'text':str(num)}
+            leaf['replies'] = [sub]
+            leaf = sub
+        leaf['text'] = text
+        return cstruct
+
+    def test_deep(self):
+        import sys
+        schema = self._makeThread()
+        depth = sys.getrecursionlimit() * 2
+        result = schema.deserialize(self._makeCstruct(depth), iterative=True)
+        count = 1
+        while result['replies']:
+            result = result['replies'][0]
+            count += 1
+        self.assertEqual(count, depth)
+        self.assertEqual(result, {'text':u'x', 'replies':[]})
+
+    def test_deep_invalid(self):
+        import sys
+        schema = self._makeThread()
+        depth = sys.getrecursionlimit() * 2
+        e = invalid_exc(schema.deserialize, self._makeCstruct(depth, ''),
+                        iterative=True)
+        count = 1
+        while e.children[0].node is schema.children[1]:
+            self.assertEqual(len(e.children), 1)
+            e = e.children[0].children[0]
+            count += 1
+        self.assertEqual(count, depth)
+        self.failUnless(e.children[0].node is schema.children[0])
+        self.assertEqual(e.children[0].msg, 'Required')
+
+    def test_same_as_recursive(self):
+        schema = self._makeThread()
+        self._assertSame(schema, self._makeCstruct(5))
+        self._assertSame(schema, self._makeCstruct(5, ''))
+        self._assertSame(schema, {'text':'a', 'replies':[
+            {'text':''}, {'text':'b'}, 5, {'replies':'x'}]})
+        self._assertSame(schema, None)
+
+    def test_leaf(self):
+        import colander
+        node = colander.SchemaNode(colander.Int(),
+                                   validator=colander.Range(0, 5))
+        self.assertEqual(node.deserialize('3', iterative=True), 3)
+        self._assertSame(node, '6')
+        self._assertSame(node, colander.null)
+
+    def test_mapping_options(self):
+        import colander
+        for unknown in ('ignore', 'raise', 'preserve'):
+            schema = colander.SchemaNode(
+                colander.Mapping(unknown=unknown),
+                colander.SchemaNode(colander.Int(), name='a'),
+                colander.SchemaNode(colander.Int(), name='b', missing=0))
+            self._assertSame(schema, {'a':'1', 'c':'x'})
+            self._assertSame(schema, {'b':'x'})
+            self._assertSame(schema, [('a', '1')])
+        schema = colander.SchemaNode(
+            colander.Mapping(factory='record'),
+            colander.SchemaNode(colander.Int(), name='a'))
+        result = self._assertSame(schema, {'a':'1'})
+        self.assertEqual(result.a, 1)
+
+    def test_tuple(self):
+        import colander
+        schema = colander.SchemaNode(
+            colander.Tuple(),
+            colander.SchemaNode(colander.Int()),
+            colander.SchemaNode(colander.Tuple(),
+                                colander.SchemaNode(colander.String())))
+        self.assertEqual(self._assertSame(schema, ('1', ('a',))),
+                         (1, (u'a',)))
+        self._assertSame(schema, ('x', ('',)))
+        self._assertSame(schema, ('1',))
+        self._assertSame(schema, 1)
+
+    def test_sequence_validate_items(self):
+        import colander
+        schema = colander.SchemaNode(
+            colander.Sequence(),
+            colander.SchemaNode(
+                colander.Sequence(),
+                colander.SchemaNode(colander.Int(),
+                                    validator=colander.Range(0, 5),
+                                    missing=10)),
+            validator=colander.Length(max=2))
+        self.assertEqual(self._assertSame(schema, [['1', colander.null]]),
+                         [[1, 10]])
+        self._assertSame(schema, [['1', '7', 'x', '9'], [], ['-1']])
+        self._assertSame(schema, [[], [], []])
+
+    def test_preparer_and_validator(self):
+        import colander
+        def validator(node, value):
+            if len(value) > 1:
+                raise colander.Invalid(node, 'Too many')
+        schema = colander.SchemaNode(
+            colander.Sequence(),
+            colander.SchemaNode(colander.Mapping(),
+                                colander.SchemaNode(colander.Int(), name='a'),
+                                preparer=lambda value: value or colander.null,
+                                missing={'a':0}),
+            validator=validator)
+        self.assertEqual(self._assertSame(schema, [{'a':'1'}]), [{'a':1}])
+        self._assertSame(schema, [{'a':'1'}, {'a':'2'}])
+
+    def test_fallback(self):
+        import colander
+        class Node(colander.SchemaNode):
+            def deserialize(self, cstruct=colander.null):
+                return ('node',
+                        colander.SchemaNode.deserialize(self, cstruct))
+        schema = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.Mapping(lazy=True),
+                                colander.SchemaNode(colander.Int(), name='a'),
+                                name='lazy'),
+            Node(colander.Tuple(), colander.SchemaNode(colander.Int()),
+                 name='node'))
+        result = schema.deserialize({'lazy':{'a':'1'}, 'node':('2',)},
+                                    iterative=True)
+        self.assertEqual(result['lazy']['a'], 1)
+        self.assertEqual(result['node'], ('node', (2,)))
+
+    def test_leaf_override(self):
+        import colander
+        class Marked(colander.SchemaNode):
+            def deserialize(self, cstruct=colander.null, **kw):
+                return colander.SchemaNode.deserialize(
+                    self, cstruct, **kw) + u'!'
+        node = Marked(colander.String())
+        # the override is applied once
+        self.assertEqual(node.deserialize('ab', iterative=True), u'ab!')
+
+    def test_limits_and_deadline(self):
+        import time
+        import colander
+        schema = self._makeThread()
+        cstruct = self._makeCstruct(4)
+        e = self._assertSame(schema, cstruct,
+                             limits=colander.Limits(max_depth=3))
+        self.failUnless(isinstance(e, colander.LimitExceeded))
+        self._assertSame(schema, cstruct, limits=colander.Limits(max_nodes=8))
+        self._assertSame(schema, cstruct, limits=colander.Limits(max_nodes=7))
+        e = self._assertSame(schema, cstruct, deadline=time.time() - 1)
+        self.failUnless(isinstance(e, colander.DeadlineExceeded))
+
+    def test_projection(self):
+        schema = self._makeThread()
+        result = self._assertSame(schema, {'text':'a', 'replies':'x'},
+                                  only=['text'])
+        self.assertEqual(result, {'text':u'a'})
+
+class TestChunkedDeserializer(unittest.TestCase):
+    def _makeNode(self, validator=None, subvalidator=None, preparer=None):
+        import colander
+        return colander.SchemaNode(
+            colander.Sequence(),
+            colander.SchemaNode(colander.Int(), validator=subvalidator),
+            name='seq', validator=validator, preparer=preparer)
+
+    def test_progress(self):
+        node = self._makeNode()
+        deserializer = node.deserialize_chunked(['1', '2', '3', '4', '5'],
+                                                chunk_size=2)
+        self.assertEqual(list(deserializer), [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(deserializer.result, [1, 2, 3, 4, 5])
+        self.assertEqual(deserializer.done, 5)
+
+    def test_run(self):
+        node = self._makeNode(preparer=sorted)
+        deserializer = node.deserialize_chunked(('3', '1', '2'), chunk_size=2)
+        self.assertEqual(deserializer.run(), [1, 2, 3])
+
+    def test_empty(self):
+        node = self._makeNode()
+        deserializer = node.deserialize_chunked([])
+        self.assertEqual(list(deserializer), [])
+        self.assertEqual(deserializer.result, [])
+
+    def test_errors_same_as_deserialize(self):
+        import colander
+        node = self._makeNode(subvalidator=colander.Range(0, 10))
+        cstruct = ['1', 'x', '11', '2']
+        expected = invalid_exc(node.deserialize, cstruct)
+        deserializer = node.deserialize_chunked(cstruct, chunk_size=1)
+        progress = []
+        try:
+            for step in deserializer:
+                progress.append(step)
+        except colander.Invalid, e:
+            self.assertEqual(e.asdict(), expected.asdict())
+            self.assertEqual([x.pos for x in e.children], [1, 2])
+        else: # pragma: no cover
+            self.fail('Invalid not raised')
+        self.assertEqual(progress, [(1, 4), (2, 4), (3, 4), (4, 4)])
+
+    def test_per_item_validator(self):
+        node = self._makeNode(subvalidator=DummyValidator('bad'))
+        e = invalid_exc(node.deserialize_chunked(['1', '2']).run)
+        self.assertEqual(e.asdict(), {'seq.0':'bad', 'seq.1':'bad'})
+
+    def test_node_validator(self):
+        node = self._makeNode(validator=DummyValidator('short'))
+        e = invalid_exc(node.deserialize_chunked(['1']).run)
+        self.assertEqual(e.msg, 'short')
+
+    def test_null(self):
+        import colander
+        node = self._makeNode()
+        node.missing = None
+        deserializer = node.deserialize_chunked()
+        self.assertEqual(list(deserializer), [(1, 1)])
+        self.assertEqual(deserializer.result, None)
+        deserializer = self._makeNode().deserialize_chunked(colander.null)
+        e = invalid_exc(deserializer.run)
+        self.assertEqual(e.msg, 'Required')
+
+    def test_not_a_sequence(self):
+        import colander
+        node = colander.SchemaNode(colander.Int())
+        deserializer = node.deserialize_chunked('1')
+        self.assertEqual(list(deserializer), [(1, 1)])
+        self.assertEqual(deserializer.result, 1)
+
+    def test_envelope(self):
+        import colander
+        node = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.Int(), name='count'),
+            colander.SchemaNode(
+                colander.Sequence(),
+                colander.SchemaNode(colander.Int(),
+                                    validator=colander.Range(0, 10)),
+                name='items'))
+        cstruct = {'count':'5', 'items':['1', '2', '3', '4', '5']}
+        deserializer = node.deserialize_chunked(cstruct, chunk_size=2)
+        self.assertEqual(list(deserializer), [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(deserializer.result, node.deserialize(cstruct))
+        cstruct['items'][3] = '11'
+        e = invalid_exc(node.deserialize_chunked(cstruct, chunk_size=2).run)
+        self.assertEqual(e.asdict(), invalid_exc(node.deserialize,
+                                                 cstruct).asdict())
+
+    def test_nested_sequences(self):
+        import colander
+        node = colander.SchemaNode(
+            colander.Sequence(),
+            colander.SchemaNode(colander.Sequence(),
+                                colander.SchemaNode(colander.Int())))
+        deserializer = node.deserialize_chunked([['1', '2'], ['3']],
+                                                chunk_size=2)
+        # the items of the inner sequences are counted as they are found
+        self.assertEqual(list(deserializer), [(2, 4), (4, 5), (5, 5)])
+        self.assertEqual(deserializer.result, [[1, 2], [3]])
+
+    def test_no_sequence_items(self):
+        import colander
+        node = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.Int(), name='a'))
+        deserializer = node.deserialize_chunked({'a':'1'})
+        self.assertEqual(list(deserializer), [])
+        self.assertEqual(deserializer.result, {'a':1})
+
+    def test_deserialize_override(self):
+        import colander
+        class Reversed(colander.SchemaNode):
+            def deserialize(self, cstruct=colander.null):
+                result = colander.SchemaNode.deserialize(self, cstruct)
+                result.reverse()
+                return result
+        node = Reversed(colander.Sequence(),
+                        colander.SchemaNode(colander.Int()))
+        deserializer = node.deserialize_chunked(['1', '2'], chunk_size=1)
+        self.assertEqual(list(deserializer), [(1, 1)])
+        self.assertEqual(deserializer.result, [2, 1])
+
+class TestSchemaNodeDeserializeColumns(unittest.TestCase):
+    def _makeNode(self, unknown='ignore', **kw):
+        import colander
+        return colander.SchemaNode(
+            colander.Mapping(unknown=unknown),
+            colander.SchemaNode(colander.Int(), name='i',
+                                validator=colander.Range(0, 10)),
+            colander.SchemaNode(colander.Float(), name='f'),
+            colander.SchemaNode(colander.Bool(), name='b'),
+            colander.SchemaNode(colander.String(), name='s'),
+            **kw)
+
+    def test_not_a_mapping(self):
+        import colander
+        node = colander.SchemaNode(colander.Int())
+        self.assertRaises(ValueError, node.deserialize_columns, [])
+
+    def test_columns(self):
+        import array
+        node = self._makeNode()
+        records = [{'i':'1', 'f':'1.5', 'b':'true', 's':'a'},
+                   {'i':'2', 'f':'2.5', 'b':'false', 's':'b'}]
+        columns, valid, errors = node.deserialize_columns(iter(records))
+        self.assertEqual(columns['i'], array.array('l', [1, 2]))
+        self.assertEqual(columns['f'], array.array('d', [1.5, 2.5]))
+        self.assertEqual(columns['b'], array.array('b', [1, 0]))
+        self.assertEqual(columns['s'], [u'a', u'b'])
+        self.assertEqual(valid, [True, True])
+        self.assertEqual(errors, {})
+
+    def test_invalid_rows(self):
+        import array
+        from colander import null
+        node = self._makeNode()
+        records = [{'i':'11', 'f':'x', 'b':'true', 's':'a'},
+                   {'i':'2', 'f':'2.5', 'b':'false', 's':'b'},
+                   None]
+        columns, valid, errors = node.deserialize_columns(records)
+        self.assertEqual(columns['i'], array.array('l', [0, 2, 0]))
+        self.assertEqual(columns['s'], [null, u'b', null])
+        self.assertEqual(valid, [False, True, False])
+        self.assertEqual(sorted(errors.keys()), [0, 2])
+        self.assertEqual(errors[0].asdict(),
+                         {'i':'11 is greater than maximum value 10',
+                          'f':'"x" is not a number'})
+        self.assertEqual(errors[0].asdict(),
+                         invalid_exc(node.deserialize, records[0]).asdict())
+        self.failUnless(errors[2].msg.interpolate().startswith(
+            '"None" is not a mapping type'))
+
+    def test_null_row(self):
+        from colander import null
+        node = self._makeNode()
+        columns, valid, errors = node.deserialize_columns([null])
+        self.assertEqual(valid, [False])
+        self.assertEqual(errors[0].msg, 'Required')
+
+    def test_falls_back_to_list(self):
+        import colander
+        node = self._makeNode()
+        node['i'].missing = None
+        node['f'].missing = 0
+        records = [{'i':'1', 'f':'1', 'b':'1', 's':'a'},
+                   {'i':str(2**80), 'b':'1', 's':'a'},
+                   {'f':'2', 'b':'1', 's':'a'}]
+        node['i'].validator = None
+        columns, valid, errors = node.deserialize_columns(records)
+        self.assertEqual(columns['i'], [1, 2**80, None])
+        self.assertEqual(list(columns['f']), [1.0, 0.0, 2.0])
+
+    def test_pairs_record(self):
+        node = self._makeNode()
+        record = [('i', '1'), ('f', '1'), ('b', '1'), ('s', 'a')]
+        columns, valid, errors = node.deserialize_columns([record])
+        self.assertEqual(valid, [True])
+
+    def test_unknown_raise(self):
+        node = self._makeNode(unknown='raise')
+        record = {'i':'1', 'f':'1', 'b':'1', 's':'a', 'z':'1'}
+        columns, valid, errors = node.deserialize_columns([record])
+        self.assertEqual(errors[0].msg.interpolate(),
+                         "Unrecognized keys in mapping: \"{'z': '1'}\"")
+
+    def test_preparer_and_validator(self):
+        from colander import Invalid
+        def preparer(appstruct):
+            appstruct['s'] = appstruct['s'].upper()
+            return appstruct
+        def validator(node, appstruct):
+            if appstruct['i'] > 5:
+                raise Invalid(node, 'too big')
+        from colander import null
+        node = self._makeNode(preparer=preparer, validator=validator)
+        records = [{'i':'1', 'f':'1', 'b':'1', 's':'a'},
+                   {'i':'6', 'f':'1', 'b':'1', 's':'b'}]
+        columns, valid, errors = node.deserialize_columns(records)
+        self.assertEqual(columns['s'], [u'A', null])
+        self.assertEqual(valid, [True, False])
+        self.assertEqual(errors[1].msg, 'too big')
+
+    def test_numpy(self):
+        try:
+            import numpy
+        except ImportError: # pragma: no cover
+            return
+        from colander import null
+        node = self._makeNode()
+        records = [{'i':'1', 'f':'1.5', 'b':'true', 's':'a'},
+                   {'i':'x', 'f':'2.5', 'b':'false', 's':'b'}]
+        columns, valid, errors = node.deserialize_columns(records, numpy=True)
+        self.assertEqual(list(columns['i']), [1, 0])
+        self.assertEqual(columns['b'].dtype, numpy.bool_)
+        self.assertEqual(columns['s'], [u'a', null])
+        self.assertEqual(list(valid), [True, False])
+
 class TestDeferred(unittest.TestCase):
     def _makeOne(self, wrapped):
         from colander import deferred
@@ -2427,6 +4571,50 @@ class DummyValidator(object):
         if self.msg:
             raise Invalid(node, self.msg)
 
+class DummyFuture(object):
+    waited = False
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+
+    def result(self):
+        self.waited = True
+        return self.fn(*self.args)
+
+class DummyExecutor(object):
+    def __init__(self):
+        self.submitted = []
+        self.futures = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn,) + args)
+        future = DummyFuture(fn, args)
+        self.futures.append(future)
+        return future
+
+class ThreadFuture(object):
+    def __init__(self, fn, args):
+        import threading
+        self.exc_info = None
+        self.thread = threading.Thread(target=self.run, args=(fn, args))
+        self.thread.start()
+
+    def run(self, fn, args):
+        import sys
+        try:
+            fn(*args)
+        except:
+            self.exc_info = sys.exc_info()
+
+    def result(self):
+        self.thread.join()
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+
+class ThreadExecutor(object):
+    def submit(self, fn, *args):
+        return ThreadFuture(fn, args)
+
 class Uncooperative(object):
     def __str__(self):
         raise ValueError('I wont cooperate')